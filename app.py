@@ -1,68 +1,156 @@
 import time
+_BOOT = time.monotonic() # Startup timeline starts here, before the heavy imports
+
 import sys
 import logging
 import os
 import signal
+import threading
 
 #using pygame for audio and events
 os.environ['SDL_VIDEODRIVER'] = 'dummy'
 
-from modules.Phone import Phone
-from modules.OSC import OSCHandler
-from modules.ArtNet import ArtNetClient
-from modules.Serial import Serial
+# Phone (pygame, gpiozero), OSC and ArtNet are imported inside their startup phases so
+# the imports themselves run in parallel.
+from modules.Startup import Startup
+from modules import Trace
+from modules import Metrics
 
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "DEBUG"))
 log = logging.getLogger("app")
 
-CTRL_PC_ADDRESS="192.168.0.20"
-DMX_TO_ARTNET_ADDRESS="192.168.0.10"
+# Overridable from the environment so the app can run against modules/Simulation.py
+CTRL_PC_ADDRESS = os.environ.get("CTRL_PC_ADDRESS", "192.168.0.20")
+DMX_TO_ARTNET_ADDRESS = os.environ.get("DMX_TO_ARTNET_ADDRESS", "192.168.0.10")
+OSC_LISTEN_PORT = int(os.environ.get("OSC_LISTEN_PORT", 7000))
+OSC_SEND_PORT = int(os.environ.get("OSC_SEND_PORT", 8000))
+OSC_BACKEND = os.environ.get("OSC_BACKEND", "threading") # or "asyncio"
 SMOKE_MACHINE_DMX_ADDRESS = 450
+ARTNET_FPS = 40
+DIALOGUE_DIR = "assets/dialogue"
+START_TIMEOUT = 10 # Seconds a cue waits for the subsystem it needs to come up
 
 tdiq_phone_instance = None
 
 class TDIQPhone:
     def __init__(self):
         log.info("Initializing...")
+        self.phone = None
+        self.osc = None
+        self.artnet = None
+        self.metrics_server = None
+
+        # Phone, OSC and ArtNet come up side by side. The prop is ready once the phone and
+        # OSC are; preloading dialogue and the self-test carry on in the background.
+        self.startup = Startup(t0=_BOOT)
+        self.startup.phase("phone", self._start_phone)
+        self.startup.phase("osc", self._start_osc)
+        self.startup.phase("artnet", self._start_artnet)
+        self.startup.phase("ready", lambda: self.startup.mark("ready for /props/phone/start"), after=("phone", "osc"))
+        self.startup.phase("metrics", self._start_metrics, critical=False)
+        self.startup.phase("assets", self._load_assets, after=("phone",), critical=False)
+        if os.environ.get("SKIP_TEST"):
+            self.startup.phase("ambient", self._start_ambient, after=("assets",), critical=False)
+        else:
+            self.startup.phase("self-test", self._self_test, after=("phone", "assets"), critical=False)
+        self.startup.phase("report", self._log_startup_report, after=tuple(self.startup.phases()), critical=False)
+        self.startup.run()
+        log.info("Initialization complete")
 
+    def _start_phone(self):
+        from modules.Phone import Phone
         self.phone = Phone(pick_up_cb=self.on_pick_up_phone, hang_up_cb=self.on_hang_up_phone)
 
-        self.osc = OSCHandler(send_ip=CTRL_PC_ADDRESS)
-        self.osc.subscribe("/props/phone/start", self.on_start_msg)
+    def _start_osc(self):
+        from modules.OSC import OSCHandler
+        self.osc = OSCHandler(listen_port=OSC_LISTEN_PORT, send_ip=CTRL_PC_ADDRESS, send_port=OSC_SEND_PORT, backend=OSC_BACKEND, queued_send=True, fast_dispatch=True,
+                              dedup_addresses=("/props/phone/pickup", "/props/phone/hangup"))
+        self.osc.subscribe("/props/phone/start", self.on_start_msg, policy="latest")
+        self.osc.subscribe("/props/phone/trace/dump", self.on_trace_dump_msg, policy="drop_if_busy")
+        self.osc.subscribe("/props/phone/metrics", self.on_metrics_msg, policy="drop_if_busy")
         self.osc.start_server()
+
+    def _start_artnet(self):
+        from modules.ArtNet import ArtNetClient
         self.artnet = ArtNetClient(target_ip=DMX_TO_ARTNET_ADDRESS, universe=0)
+        self.artnet.start_refresh(fps=ARTNET_FPS)
+
+    def _start_metrics(self):
+        self.metrics_server = Metrics.MetricsServer()
+        self.metrics_server.start()
+
+    def _load_assets(self):
+        self.phone.handset.preload_sounds(DIALOGUE_DIR)
+        self.phone.warm_up()
+
+    def _start_ambient(self):
         self.phone.handset.loop_file("assets/dialogue/call2.wav")
-        log.info("Initialization complete")
+
+    def _self_test(self):
+        # The self-test plays on the handset channel, which would stop the ambient loop,
+        # so the loop only starts once the phrase has finished (or the test failed).
+        try:
+            self.phone.self_test()
+        finally:
+            self._start_ambient()
+
+    def _log_startup_report(self):
+        for line in self.startup.report():
+            log.info(line)
 
     def on_pick_up_phone(self):
             log.info("phone picked up")
-            self.osc.send("/props/phone/pickup", 1)
+            if self.startup.is_done("osc"):
+                self.osc.send("/props/phone/pickup", 1)
             # self.phone.handset.loop_file("assets/dialogue/call2.wav")
             # log.info("smokin meats")
-            # self.artnet.send_value(channel=SMOKE_MACHINE_DMX_ADDRESS, value=30)
-            # time.sleep(0.75)
-            # log.info("done smokin em")
-            # self.artnet.send_value(channel=SMOKE_MACHINE_DMX_ADDRESS, value=0)
+            # self.artnet.pulse(channel=SMOKE_MACHINE_DMX_ADDRESS, value=30, duration=0.75)
 
 
     def on_hang_up_phone(self):
-        self.osc.send("/props/phone/hangup", 1)
+        if self.startup.is_done("osc"):
+            self.osc.send("/props/phone/hangup", 1)
         self.phone.handset.stop_loop()
 
     def on_start_msg(self, address, value):
         log.info("received message to start")
+        try:
+            self.startup.wait("phone", timeout=START_TIMEOUT)
+        except RuntimeError as e:
+            log.error("Cannot start: {}".format(e))
+            return
         self.phone.single_ring()
 
+    def on_trace_dump_msg(self, address, *args):
+        """Writes the trace buffer to Trace.TRACE_DIR, under the file name given as the argument if any."""
+        if not Trace.tracer.enabled:
+            log.warning("Trace dump requested but tracing is off (set TRACE=1)")
+            return
+        try:
+            path = Trace.trace_path(args[0]) if args else None
+        except ValueError as e:
+            log.warning("Rejected trace dump request: {}".format(e))
+            return
+        Trace.dump(path)
+
+    def on_metrics_msg(self, address, *args):
+        """Replies on /props/phone/metrics/values with the metrics as a JSON string, optionally only names starting with args[0]."""
+        prefix = args[0] if args and isinstance(args[0], str) else ""
+        self.osc.send("/props/phone/metrics/values", Metrics.REGISTRY.to_json(prefix))
+
     def stop(self):
         log.info("Safely shutting down tdiq phone...")
-        if hasattr(self, 'osc') and self.osc:
+        if getattr(self, 'osc', None):
              self.osc.stop_server()
              log.info("OSC server stopped.")
-        if hasattr(self, 'phone') and self.phone:
+        if getattr(self, 'phone', None):
             self.phone.stop()
             log.info("Phone resources released.")
-        
-        self.artnet.send_value(channel=SMOKE_MACHINE_DMX_ADDRESS, value=0)
+        if getattr(self, 'metrics_server', None):
+            self.metrics_server.stop()
+        if getattr(self, 'artnet', None):
+            self.artnet.send_value(channel=SMOKE_MACHINE_DMX_ADDRESS, value=0)
+            self.artnet.stop()
 
         log.info("Shutdown tasks complete.")
 
@@ -78,9 +166,17 @@ def shutdown_handler(signum, frame):
     sys.exit(0) 
 
 
+def trace_dump_handler(signum, frame):
+    """Dumps the trace buffer on SIGUSR1, off the main thread."""
+    thread = threading.Thread(target=Trace.dump, name="trace-dump")
+    thread.daemon = True
+    thread.start()
+
+
 if __name__ == "__main__":
     signal.signal(signal.SIGTERM, shutdown_handler)
     signal.signal(signal.SIGINT, shutdown_handler)
+    signal.signal(signal.SIGUSR1, trace_dump_handler)
 
     try:
         # Assign the instance to the global variable
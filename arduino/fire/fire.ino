@@ -3,9 +3,30 @@
 
 enum Mode {
   OFF,
-  FIRE_ON
+  FIRE_ON,
+  STREAM    // Showing frames rendered on the host (modules/LedStream.py)
 };
 
+// Binary LED frames: SYNC, type, length (2 bytes LE), payload, checksum (payload sum & 0xFF).
+// Pixels are 4 bytes in leds[] memory order (G, R, B, W). A frame is acknowledged with
+// the line "K" once shown; the host waits for it, since show() blocks serial interrupts.
+enum ParseState {
+  TEXT,
+  FRAME_TYPE,
+  FRAME_LEN_LO,
+  FRAME_LEN_HI,
+  FRAME_PAYLOAD,
+  FRAME_CHECKSUM
+};
+
+#define SYNC        0xA5
+#define FRAME_KEY   0x01  // Every pixel
+#define FRAME_DELTA 0x02  // Spans: start (2 bytes LE), count (1 byte), count pixels
+#define FRAME_RLE   0x03  // Runs from pixel 0: count (1 byte), one pixel
+
+#define BAUD_RATE   500000  // Must match BAUD_RATE in modules/Serial.py
+#define MAX_LINE    32
+
 #define DATA_PIN     3
 #define COLOR_ORDER GRB
 #define CHIPSET     WS2812B
@@ -25,8 +46,25 @@ CRGB *ledsRGB = (CRGB *) &leds[0];
 
 Mode currentMode = OFF;
 
+uint8_t *ledBytes = (uint8_t *) &leds[0];
+const uint16_t LED_BYTES = NUM_LEDS * 4;
+
+char line[MAX_LINE + 1];
+uint8_t lineLen = 0;
+
+ParseState parseState = TEXT;
+uint8_t frameType;
+uint16_t frameLen;
+uint16_t frameRead;
+uint8_t frameSum;
+uint16_t spanStart;   // Delta: next byte of the current span in ledBytes
+uint16_t spanBytes;   // Delta: pixel bytes left in the current span
+uint8_t header[5];    // Delta span header or RLE run, as it arrives
+uint8_t headerLen;
+uint16_t outPos;      // Key/RLE: next byte of ledBytes to write
+
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(BAUD_RATE);
 	FastLED.addLeds<WS2812B, DATA_PIN, RGB>(ledsRGB, getRGBWsize(NUM_LEDS));
   FastLED.setBrightness( BRIGHTNESS );
   fill_solid_rgbw(CRGB::Green);
@@ -37,29 +75,8 @@ void setup() {
 }
 
 void loop(){  
-  if (Serial.available() > 0) {
-    String message = Serial.readStringUntil('\n');
-    message.trim();
-    
-    if (message == "L1") {
-      currentMode = FIRE_ON;
-      Serial.println("Light ON");
-    }
-    else if (message == "L0") {
-      currentMode = OFF;
-      fill_solid_rgbw(CRGB::Black);
-      Serial.println("Light OFF");
-    }
-    else if (message == "S1") {
-      Serial.println("Smoke ON");
-    }
-    else if (message == "S0") {
-      Serial.println("Smoke OFF");
-    }
-    else {
-      Serial.print("Unknown command: ");
-      Serial.println(message);
-    }
+  while (Serial.available() > 0) {
+    handleByte(Serial.read());
   }
 
   if (currentMode == FIRE_ON) {
@@ -71,6 +88,115 @@ void loop(){
 }
 
 
+void handleCommand(char *message) {
+  // Trim whitespace (e.g. the '\r' of "\r\n")
+  while (*message == ' ' || *message == '\r' || *message == '\t') message++;
+  int len = strlen(message);
+  while (len > 0 && (message[len - 1] == ' ' || message[len - 1] == '\r' || message[len - 1] == '\t')) {
+    message[--len] = '\0';
+  }
+
+  if (strcmp(message, "L1") == 0) {
+    currentMode = FIRE_ON;
+    Serial.println("Light ON");
+  }
+  else if (strcmp(message, "L0") == 0) {
+    currentMode = OFF;
+    fill_solid_rgbw(CRGB::Black);
+    Serial.println("Light OFF");
+  }
+  else if (strcmp(message, "S1") == 0) {
+    Serial.println("Smoke ON");
+  }
+  else if (strcmp(message, "S0") == 0) {
+    Serial.println("Smoke OFF");
+  }
+  else {
+    Serial.print("Unknown command: ");
+    Serial.println(message);
+  }
+}
+
+void handleByte(uint8_t b) {
+  switch (parseState) {
+    case TEXT:
+      if (b == SYNC && lineLen == 0) {
+        parseState = FRAME_TYPE;
+      }
+      else if (b == '\n') {
+        line[lineLen] = '\0';
+        lineLen = 0;
+        handleCommand(line);
+      }
+      else if (lineLen < MAX_LINE) {
+        line[lineLen++] = b;
+      }
+      break;
+    case FRAME_TYPE:
+      frameType = b;
+      parseState = FRAME_LEN_LO;
+      break;
+    case FRAME_LEN_LO:
+      frameLen = b;
+      parseState = FRAME_LEN_HI;
+      break;
+    case FRAME_LEN_HI:
+      frameLen |= (uint16_t) b << 8;
+      frameRead = 0;
+      frameSum = 0;
+      headerLen = 0;
+      spanBytes = 0;
+      outPos = 0;
+      parseState = frameLen ? FRAME_PAYLOAD : FRAME_CHECKSUM;
+      break;
+    case FRAME_PAYLOAD:
+      frameSum += b;
+      handlePayloadByte(b);
+      if (++frameRead == frameLen) parseState = FRAME_CHECKSUM;
+      break;
+    case FRAME_CHECKSUM:
+      parseState = TEXT;
+      if (b == frameSum) {
+        currentMode = STREAM;
+        FastLED.show();
+        Serial.println("K");
+      } else {
+        Serial.println("Frame error");
+      }
+      break;
+  }
+}
+
+void handlePayloadByte(uint8_t b) {
+  if (frameType == FRAME_KEY) {
+    if (outPos < LED_BYTES) ledBytes[outPos++] = b;
+  }
+  else if (frameType == FRAME_DELTA) {
+    if (spanBytes > 0) {
+      if (spanStart < LED_BYTES) ledBytes[spanStart] = b;
+      spanStart++;
+      spanBytes--;
+      return;
+    }
+    header[headerLen++] = b;
+    if (headerLen == 3) {
+      spanStart = (header[0] | ((uint16_t) header[1] << 8)) * 4;
+      spanBytes = (uint16_t) header[2] * 4;
+      headerLen = 0;
+    }
+  }
+  else if (frameType == FRAME_RLE) {
+    header[headerLen++] = b;
+    if (headerLen == 5) {
+      for (uint8_t i = 0; i < header[0] && outPos < LED_BYTES; i++) {
+        memcpy(ledBytes + outPos, header + 1, 4);
+        outPos += 4;
+      }
+      headerLen = 0;
+    }
+  }
+}
+
 void fill_solid_rgbw( const CRGB color) {
   for( int i = 0; i < NUM_LEDS; i++) {
       leds[i] = color;
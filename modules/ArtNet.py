@@ -2,9 +2,20 @@ import logging
 import socket
 import time
 import array
+import threading
+from contextlib import contextmanager
+
+from modules import Trace
+from modules import Metrics
 
 log = logging.getLogger("ARTNET")
 
+DEFAULT_FPS = 40
+KEEPALIVE_SECONDS = 1.0 # Resend an unchanged universe this often so nodes don't time out
+
+PACKETS_SENT = Metrics.counter("phone_artnet_packets_total", "Art-Net packets sent")
+SEND_ERRORS = Metrics.counter("phone_artnet_send_errors_total", "Art-Net packets that failed to send")
+
 class ArtNetClient:
     """
     A minimal Art-Net implementation for sending DMX values over network.
@@ -12,64 +23,222 @@ class ArtNetClient:
     
     Attributes:
         target_ip (str): The IP address to send ArtNet data to
-        universe (int): The universe number (0-255)
+        universe (int): The 15-bit Port-Address (Net << 8 | SubNet << 4 | Universe, 0-32767)
         packet_size (int): Size of DMX packet (usually 512)
     """
     
     HEADER = b'Art-Net\x00'  # Art-Net Header
     PROTOCOL_VERSION = 14    # Current protocol is 14
     OPCODE_ARTDMX = 0x5000  # ArtDMX opcode
+    PORT = 6454             # Art-Net UDP port
+    DMX_OFFSET = 18         # Header length; DMX data starts here
     
-    def __init__(self, target_ip="127.0.0.1", universe=0, packet_size=512):
+    def __init__(self, target_ip="127.0.0.1", universe=0, packet_size=512, sequence=False, sock=None, min_send_interval=0):
         """
         Initialize ArtNet sender.
         
         Args:
             target_ip (str): IP address to send ArtNet data to. Defaults to "127.0.0.1".
-            universe (int): Universe number (0-255). Defaults to 0.
+            universe (int): Port-Address (0-32767), see port_address(). Defaults to 0.
             packet_size (int): Size of DMX packet. Defaults to 512.
+            sequence (bool): Stamp packets with a rolling 1-255 sequence number. Defaults to False.
+            sock (socket.socket): UDP socket to share with other clients. Defaults to a new socket.
+            min_send_interval (float): Minimum seconds between packets; changes inside the
+                                       window are merged into one deferred packet. Defaults to 0.
         """
         self.target_ip = target_ip
-        self.universe = min(255, max(0, universe))  # Clamp between 0-255
+        self.universe = min(0x7FFF, max(0, universe))  # Clamp to 15 bits
         self.packet_size = min(512, max(24, packet_size))  # Clamp between 24-512
+        self.sequence = sequence
+        self._sequence = 0
+        self._address = (self.target_ip, self.PORT)
         
         # Initialize socket
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._owns_socket = sock is None
+        self._socket = sock if sock is not None else socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         
-        # Initialize DMX buffer with zeros
-        self._buffer = array.array('B', [0] * self.packet_size)
+        # One packet buffer for the life of the client. The header is written once and
+        # the DMX payload is edited in place through a memoryview, so sends never copy.
+        self._packet = bytearray(self.DMX_OFFSET + self.packet_size)
+        self._write_header()
+        self._buffer = memoryview(self._packet)[self.DMX_OFFSET:]
+        self._lock = threading.RLock()
+        
+        # Refresh engine (see start_refresh)
+        self._cues = {}  # channel index -> cue tuple
+        self._dirty = False
+        self._refresh_thread = None
+        self._refresh_stop = threading.Event()
+        self.fps = DEFAULT_FPS
+        self.keepalive = KEEPALIVE_SECONDS
+        self._reset_frame_stats()
+        
+        # Write coalescing (see batch and min_send_interval)
+        self.min_send_interval = min_send_interval
+        self._batch = threading.local() # Batch nesting depth, per thread
+        self._pending_writes = 0 # Writes since the last packet
+        self._last_sent = 0.0
+        self._flush_timer = None
+        self.writes = 0
+        self.packets_sent = 0
+        self.packets_coalesced = 0
         
         log.info("ArtNet Client configured to send TO {}, Universe: {}".format(
             self.target_ip, self.universe))
     
-    def _make_packet(self):
-        """Construct the Art-Net packet with current buffer data."""
-        # Packet header
-        packet = bytearray(self.HEADER)  # Art-Net header
-        packet.extend([
+    def _write_header(self):
+        """Writes the ArtDMX header into the packet buffer."""
+        self._packet[0:self.DMX_OFFSET] = self.HEADER + bytes([
             self.OPCODE_ARTDMX & 0xFF,        # Opcode LSB
             (self.OPCODE_ARTDMX >> 8) & 0xFF, # Opcode MSB
             0x00,                             # Protocol version high
             self.PROTOCOL_VERSION,            # Protocol version low
             0x00,                             # Sequence (disabled)
             0x00,                             # Physical input port
-            self.universe & 0xFF,             # Universe LSB
-            0x00,                             # Universe MSB (Net + Subnet)
+            self.universe & 0xFF,             # SubUni (SubNet + Universe)
+            (self.universe >> 8) & 0x7F,      # Net
             (self.packet_size >> 8) & 0xFF,   # Length MSB
             self.packet_size & 0xFF,          # Length LSB
         ])
+    
+    @staticmethod
+    def port_address(net, subnet, universe):
+        """Builds a 15-bit Port-Address from Net (0-127), SubNet (0-15) and Universe (0-15)."""
+        if not (0 <= net <= 127 and 0 <= subnet <= 15 and 0 <= universe <= 15):
+            raise ValueError("Net must be 0-127, SubNet and Universe 0-15")
+        return (net << 8) | (subnet << 4) | universe
+    
+    def _make_packet(self):
+        """Returns the Art-Net packet with current buffer data (the shared buffer, not a copy)."""
+        return self._packet
+    
+    @property
+    def _batch_depth(self):
+        """How deep the calling thread is in batch() blocks."""
+        return getattr(self._batch, 'depth', 0)
+
+    def _send(self):
+        """
+        Sends the packet now, or marks the universe dirty so a later packet carries the change:
+        the next refresh frame, the end of the current batch, or the end of the min_send_interval window.
+        """
+        with self._lock:
+            self.writes += 1
+            self._pending_writes += 1
+            if self._refresh_thread is not None or self._batch_depth or not self._flush():
+                self._dirty = True
+    
+    def _flush(self):
+        """
+        Transmits now unless inside the min_send_interval window, in which case a
+        deferred send is scheduled. Returns True if sent. Caller holds the lock.
+        """
+        if self.min_send_interval:
+            wait = self._last_sent + self.min_send_interval - time.monotonic()
+            if wait > 0:
+                self._dirty = True
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(wait, self._deferred_flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return False
+        self._transmit()
+        return True
+    
+    def _deferred_flush(self):
+        try:
+            with self._lock:
+                self._flush_timer = None
+                if self._dirty and not self._batch_depth and self._refresh_thread is None:
+                    self._transmit()
+        except Exception as e:
+            log.error("Error sending deferred ArtNet packet: {}".format(e))
+    
+    def _transmit(self):
+        """Stamps the sequence number (if enabled) and puts the packet on the wire. Caller holds the lock."""
+        if self.sequence:
+            self._sequence = self._sequence % 255 + 1  # 1-255; 0 means disabled
+            self._packet[12] = self._sequence
+        try:
+            self._socket.sendto(self._packet, self._address)
+        except OSError:
+            SEND_ERRORS.inc()
+            raise
+        self._dirty = False
+        self._last_sent = time.monotonic()
+        self.packets_sent += 1
+        if self._pending_writes > 1:
+            # Every write after the first rode along in this packet instead of getting its own.
+            self.packets_coalesced += self._pending_writes - 1
+        self._pending_writes = 0
+        PACKETS_SENT.inc()
+    
+    @contextmanager
+    def batch(self):
+        """
+        Groups channel writes into a single packet.
+
+        Batches are per thread: only the calling thread's writes are held back. A write
+        from another thread is still sent straight away, and since the packet carries the
+        whole universe it can include part of a batch in progress.
         
-        # Add DMX data
-        packet.extend(self._buffer)
-        return packet
+        Example:
+            with client.batch():
+                client.send_value(1, 255)
+                client.set_channels(10, b'\x10\x20\x30')
+        """
+        self._batch.depth = self._batch_depth + 1
+        try:
+            yield self
+        finally:
+            self._batch.depth -= 1
+            with self._lock:
+                if self._batch.depth == 0 and self._dirty and self._refresh_thread is None:
+                    try:
+                        self._flush()
+                    except Exception as e:
+                        log.error("Error sending ArtNet batch: {}".format(e))
+    
+    def send_stats(self):
+        """Returns write coalescing counters. packets_coalesced counts writes merged into another write's packet."""
+        return {
+            'writes': self.writes,
+            'packets_sent': self.packets_sent,
+            'packets_coalesced': self.packets_coalesced,
+        }
     
-    def send_value(self, channel, value):
+    def send(self):
+        """Sends the current buffer immediately, regardless of the refresh engine."""
+        try:
+            with self._lock:
+                self._transmit()
+        except Exception as e:
+            log.error("Error sending ArtNet universe {}: {}".format(self.universe, e))
+    
+    @staticmethod
+    def _as_dmx_bytes(values):
+        """Returns values as a flat unsigned byte buffer without copying where possible."""
+        if isinstance(values, (list, tuple)):
+            return bytes(values)  # Raises ValueError outside 0-255
+        if hasattr(values, 'astype') and getattr(values, 'dtype', None) != 'uint8':
+            # NumPy array of another dtype
+            if values.size and (values.min() < 0 or values.max() > 255):
+                raise ValueError("Values must be between 0 and 255")
+            values = values.astype('uint8')
+        view = memoryview(values)
+        if view.ndim != 1 or view.itemsize != 1:
+            raise ValueError("Values must be a flat sequence of bytes")
+        return view.cast('B') if view.format != 'B' else view
+    
+    @Trace.traced("artnet.send_value", "artnet")
+    def send_value(self, channel, value, send=True):
         """
         Send a single DMX value to a specific channel.
         
         Args:
             channel (int): DMX channel number (1-512)
             value (int): DMX value (0-255)
+            send (bool): Send the packet afterwards. Defaults to True.
         """
         try:
             # Adjust channel to 0-based index
@@ -79,44 +248,336 @@ class ArtNetClient:
             if not 0 <= value <= 255:
                 raise ValueError("Value must be between 0 and 255")
             
-            self._buffer[channel_idx] = value
-            packet = self._make_packet()
-            self._socket.sendto(packet, (self.target_ip, 6454))  # 6454 is the Art-Net port
+            with self._lock:
+                self._cues.pop(channel_idx, None)
+                self._buffer[channel_idx] = value
+            if send:
+                self._send()
             log.debug("Sent DMX value {} to channel {}".format(value, channel))
         except Exception as e:
             log.error("Error sending ArtNet value to channel {}: {}".format(channel, e))
     
-    def blackout(self):
-        """Sets all channels to 0."""
+    def set_channels(self, start, values, send=True):
+        """
+        Write consecutive channels in one go.
+        
+        Args:
+            start (int): First DMX channel (1-512).
+            values: bytes, bytearray, array('B'), list of ints or a NumPy array.
+            send (bool): Send the packet afterwards. Defaults to True.
+        """
+        try:
+            data = self._as_dmx_bytes(values)
+            start_idx = start - 1
+            end_idx = start_idx + len(data)
+            if start_idx < 0 or end_idx > self.packet_size:
+                raise ValueError("Channels {}-{} out of range 1-{}".format(start, start + len(data) - 1, self.packet_size))
+            with self._lock:
+                self._cancel_cues(start_idx, end_idx)
+                self._buffer[start_idx:end_idx] = data
+            if send:
+                self._send()
+            log.debug("Set {} channels from {}".format(len(data), start))
+        except Exception as e:
+            log.error("Error setting ArtNet channels from {}: {}".format(start, e))
+    
+    def set_range(self, start, end, value, send=True):
+        """
+        Set channels start..end (inclusive, 1-based) to the same value.
+        
+        Args:
+            start (int): First DMX channel.
+            end (int): Last DMX channel.
+            value (int): DMX value (0-255).
+            send (bool): Send the packet afterwards. Defaults to True.
+        """
         try:
-            for i in range(self.packet_size):
-                self._buffer[i] = 0
-            packet = self._make_packet()
-            self._socket.sendto(packet, (self.target_ip, 6454))
-            log.debug("Set all channels to 0")
+            if not 1 <= start <= end <= self.packet_size:
+                raise ValueError("Channel range must be within 1-{}".format(self.packet_size))
+            if not 0 <= value <= 255:
+                raise ValueError("Value must be between 0 and 255")
+            with self._lock:
+                self._cancel_cues(start - 1, end)
+                self._buffer[start - 1:end] = bytes((value,)) * (end - start + 1)
+            if send:
+                self._send()
         except Exception as e:
-            log.error("Error setting blackout: {}".format(e))
+            log.error("Error setting ArtNet channels {}-{}: {}".format(start, end, e))
+    
+    def blackout(self):
+        """Sets all channels to 0."""
+        self.set_range(1, self.packet_size, 0)
+        log.debug("Set all channels to 0")
     
     def all_on(self):
         """Sets all channels to 1."""
+        self.set_range(1, self.packet_size, 1)
+        log.debug("Set all channels to 1")
+
+    def _cancel_cues(self, start_idx, end_idx):
+        """Drops running cues on channels an explicit write is about to overwrite. Caller holds the lock."""
+        if self._cues:
+            for idx in [i for i in self._cues if start_idx <= i < end_idx]:
+                del self._cues[idx]
+    
+    # --- Refresh engine ---
+    
+    def _reset_frame_stats(self):
+        self.frames_sent = 0
+        self.keepalives_sent = 0
+        self.late_frames = 0
+        self.max_lateness = 0.0
+        self._lateness_total = 0.0
+        self._ticks = 0
+    
+    def start_refresh(self, fps=DEFAULT_FPS, keepalive=KEEPALIVE_SECONDS):
+        """
+        Starts streaming the universe from a background thread.
+        
+        Frames go out at `fps` while anything changes or a cue is running, and every
+        `keepalive` seconds otherwise. While running, send_value/set_channels only
+        update the buffer; the next frame carries the change.
+        
+        Args:
+            fps (float): Frame rate. Defaults to 40.
+            keepalive (float): Idle resend interval in seconds. Defaults to 1.0.
+        """
+        if self._refresh_thread is not None:
+            return
+        self.fps = fps
+        self.keepalive = keepalive
+        self._reset_frame_stats()
+        self._refresh_stop.clear()
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name="artnet-refresh")
+        self._refresh_thread.daemon = True
+        self._refresh_thread.start()
+        log.info("ArtNet refresh started at {} fps (keepalive {}s)".format(fps, keepalive))
+    
+    def stop_refresh(self):
+        """Stops the refresh thread and sends any pending change immediately."""
+        thread, self._refresh_thread = self._refresh_thread, None
+        if thread is None:
+            return
+        self._refresh_stop.set()
+        thread.join(timeout=1)
+        with self._lock:
+            self._cues.clear()
+            if self._dirty:
+                self._dirty = False
+                self._transmit()
+        log.debug("ArtNet refresh stopped. {}".format(self.frame_stats()))
+    
+    def _refresh_loop(self):
+        period = 1.0 / self.fps
+        next_tick = time.monotonic()
+        last_send = 0.0
+        while not self._refresh_stop.is_set():
+            now = time.monotonic()
+            if now < next_tick:
+                self._refresh_stop.wait(next_tick - now)
+                continue
+            lateness = now - next_tick
+            self._ticks += 1
+            self._lateness_total += lateness
+            if lateness > self.max_lateness:
+                self.max_lateness = lateness
+            try:
+                with self._lock:
+                    active = self._apply_cues(now)
+                    if self._dirty or active or now - last_send >= self.keepalive:
+                        if not (self._dirty or active):
+                            self.keepalives_sent += 1
+                        self._dirty = False
+                        self._transmit()
+                        self.frames_sent += 1
+                        last_send = now
+            except Exception as e:
+                log.error("Error in ArtNet refresh frame: {}".format(e))
+            next_tick += period
+            if now - next_tick > period:
+                # Fell more than a frame behind (e.g. CPU stall): skip ahead rather than burst.
+                self.late_frames += 1
+                next_tick = now + period
+    
+    def _apply_cues(self, now):
+        """Writes interpolated cue values into the buffer. Returns True if any cue was active. Caller holds the lock."""
+        if not self._cues:
+            return False
+        for idx, (kind, start, duration, begin, end, restore) in list(self._cues.items()):
+            progress = (now - start) / duration if duration > 0 else 1.0
+            if kind == 'fade':
+                if progress >= 1.0:
+                    self._buffer[idx] = end
+                    del self._cues[idx]
+                else:
+                    self._buffer[idx] = int(round(begin + (end - begin) * progress))
+            elif progress >= 1.0:  # pulse
+                self._buffer[idx] = restore
+                del self._cues[idx]
+        return True
+    
+    def _check_cue_args(self, channel, value):
+        channel_idx = channel - 1
+        if not 0 <= channel_idx < self.packet_size:
+            raise ValueError("Channel must be between 1 and {}".format(self.packet_size))
+        if not 0 <= value <= 255:
+            raise ValueError("Value must be between 0 and 255")
+        if self._refresh_thread is None:
+            self.start_refresh()
+        return channel_idx
+    
+    def fade(self, channel, to, duration):
+        """
+        Fades a channel from its current value to `to` over `duration` seconds without blocking.
+        Starts the refresh engine if it isn't running.
+        """
         try:
-            for i in range(self.packet_size):
-                self._buffer[i] = 1
-            packet = self._make_packet()
-            self._socket.sendto(packet, (self.target_ip, 6454))
-            log.debug("Set all channels to 1")
+            channel_idx = self._check_cue_args(channel, to)
+            with self._lock:
+                self._cues[channel_idx] = ('fade', time.monotonic(), float(duration), self._buffer[channel_idx], to, None)
+            log.debug("Fading channel {} to {} over {}s".format(channel, to, duration))
         except Exception as e:
-            log.error("Error setting all on: {}".format(e))
-
+            log.error("Error fading ArtNet channel {}: {}".format(channel, e))
+    
+    def pulse(self, channel, value, duration):
+        """
+        Sets a channel to `value` for `duration` seconds, then restores its previous value,
+        without blocking. Starts the refresh engine if it isn't running.
+        """
+        try:
+            channel_idx = self._check_cue_args(channel, value)
+            with self._lock:
+                previous = self._cues[channel_idx][5] if channel_idx in self._cues and self._cues[channel_idx][0] == 'pulse' else self._buffer[channel_idx]
+                self._buffer[channel_idx] = value
+                self._cues[channel_idx] = ('pulse', time.monotonic(), float(duration), value, value, previous)
+                self._dirty = True
+            log.debug("Pulsing channel {} to {} for {}s".format(channel, value, duration))
+        except Exception as e:
+            log.error("Error pulsing ArtNet channel {}: {}".format(channel, e))
+    
+    def frame_stats(self):
+        """Returns refresh engine timing counters."""
+        ticks = self._ticks
+        return {
+            'fps': self.fps,
+            'ticks': ticks,
+            'frames_sent': self.frames_sent,
+            'keepalives_sent': self.keepalives_sent,
+            'late_frames': self.late_frames,
+            'mean_lateness_ms': (self._lateness_total / ticks * 1000) if ticks else 0.0,
+            'max_lateness_ms': self.max_lateness * 1000,
+        }
+    
     def stop(self):
-        """Closes the socket."""
+        """Stops the refresh engine and closes the socket."""
         try:
-            self._socket.close()
+            self.stop_refresh()
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if self._dirty:
+                    self._transmit()
+            if self._owns_socket:
+                self._socket.close()
             log.debug("ArtNet Client stopped")
         except Exception as e:
             log.error("Error stopping ArtNet client: {}".format(e))
 
 
+class ArtNetManager:
+    """
+    Owns several Art-Net universes that share one socket and latch together.
+    
+    Channel writes only update buffers and mark their universe dirty. flush() sends
+    an ArtDmx packet for each universe that changed since the last flush (with a
+    rolling sequence number) followed by one ArtSync, so nodes output every
+    universe of the batch at the same moment.
+    
+    Attributes:
+        target_ip (str): The IP address to send ArtNet data to
+        sync (bool): Whether flush() ends with an ArtSync packet
+    """
+    
+    OPCODE_ARTSYNC = 0x5200
+    
+    def __init__(self, target_ip="127.0.0.1", packet_size=512, sync=True):
+        """
+        Args:
+            target_ip (str): IP address to send ArtNet data to. Defaults to "127.0.0.1".
+            packet_size (int): DMX slots per universe. Defaults to 512.
+            sync (bool): Send ArtSync after each flush. Defaults to True.
+        """
+        self.target_ip = target_ip
+        self.packet_size = packet_size
+        self.sync = sync
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._universes = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._sync_packet = ArtNetClient.HEADER + bytes([
+            self.OPCODE_ARTSYNC & 0xFF, (self.OPCODE_ARTSYNC >> 8) & 0xFF,
+            0x00, ArtNetClient.PROTOCOL_VERSION,
+            0x00, 0x00,  # Aux1, Aux2
+        ])
+        self.packets_sent = 0
+        self.syncs_sent = 0
+        log.info("ArtNet Manager configured to send TO {} (ArtSync: {})".format(target_ip, sync))
+    
+    def universe(self, port_address):
+        """Returns the ArtNetClient for a Port-Address, creating it on first use."""
+        with self._lock:
+            client = self._universes.get(port_address)
+            if client is None:
+                client = ArtNetClient(target_ip=self.target_ip, universe=port_address,
+                                      packet_size=self.packet_size, sequence=True, sock=self._socket)
+                self._universes[port_address] = client
+            return client
+    
+    def set_value(self, port_address, channel, value):
+        """Sets one channel in a universe. Sent on the next flush()."""
+        self.universe(port_address).send_value(channel, value, send=False)
+        with self._lock:
+            self._dirty.add(port_address)
+    
+    def set_channels(self, port_address, start, values):
+        """Sets consecutive channels in a universe. Sent on the next flush()."""
+        self.universe(port_address).set_channels(start, values, send=False)
+        with self._lock:
+            self._dirty.add(port_address)
+    
+    def flush(self):
+        """Sends every universe changed since the last flush, then ArtSync. Returns the number of universes sent."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            clients = [self._universes[pa] for pa in sorted(dirty)]
+        if not clients:
+            return 0
+        try:
+            for client in clients:
+                with client._lock:
+                    client._transmit()
+                self.packets_sent += 1
+            if self.sync:
+                self._socket.sendto(self._sync_packet, (self.target_ip, ArtNetClient.PORT))
+                self.syncs_sent += 1
+        except Exception as e:
+            log.error("Error flushing ArtNet universes: {}".format(e))
+        return len(clients)
+    
+    def stop(self):
+        """Stops every universe's refresh thread and pending flush, then closes the shared socket."""
+        with self._lock:
+            clients = list(self._universes.values())
+        for client in clients:
+            client.stop() # Leaves the shared socket open
+        try:
+            self._socket.close()
+            log.debug("ArtNet Manager stopped")
+        except Exception as e:
+            log.error("Error stopping ArtNet manager: {}".format(e))
+
+
 if __name__ == "__main__":
     print("--- Starting ArtNet Example ---")
 
@@ -0,0 +1,254 @@
+import itertools
+import logging
+import threading
+import time
+
+import pyaudio
+
+from modules import Metrics
+
+log = logging.getLogger("CAPTURE")
+
+OVERFLOWS = Metrics.counter("phone_audio_overflows_total", "Capture callbacks PortAudio flagged with an input overflow")
+
+# Device index lookups by name pattern. Enumerating ALSA devices is slow on the Pi,
+# so a pattern is only resolved once per process.
+_device_cache = {}
+
+
+class AudioCapture:
+    """
+    Long-lived PyAudio input stream feeding a preallocated ring buffer.
+
+    The stream is opened once in callback mode and kept running, so consumers
+    (record, listen) never pay the PortAudio open cost and never clip the first
+    chunk of speech. Each consumer reads from the ring with its own cursor.
+
+    Attributes:
+        rate (int): Sample rate in Hz.
+        channels (int): Number of input channels.
+        chunk (int): Frames per buffer delivered by PortAudio.
+        device_pattern (str): Case-insensitive substring of the input device name, or None for default.
+        overflows (int): Callbacks PortAudio flagged with an input overflow.
+        reader_overruns (int): Times a consumer fell more than a buffer behind and skipped ahead.
+    """
+
+    def __init__(self, rate=44100, channels=1, chunk=1024, fmt=pyaudio.paInt16,
+                 device_pattern=None, buffer_seconds=10):
+        """
+        Args:
+            rate (int): Sample rate in Hz. Defaults to 44100.
+            channels (int): Input channels. Defaults to 1.
+            chunk (int): Frames per buffer. Defaults to 1024.
+            fmt (int): PyAudio sample format. Defaults to paInt16.
+            device_pattern (str): Input device name substring. Defaults to the system default device.
+            buffer_seconds (float): Ring buffer length. Defaults to 10 seconds.
+        """
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.format = fmt
+        self.device_pattern = device_pattern
+        self.sample_width = pyaudio.get_sample_size(fmt)
+        self.bytes_per_second = rate * channels * self.sample_width
+        self.chunk_bytes = chunk * channels * self.sample_width
+
+        chunks_in_buffer = max(2, int(buffer_seconds * rate / chunk))
+        self.capacity = chunks_in_buffer * self.chunk_bytes
+        self._ring = bytearray(self.capacity)
+        self._ring_view = memoryview(self._ring)
+        self._write_total = 0
+        self._cond = threading.Condition()
+
+        self._audio = None
+        self._stream = None
+        self.device_index = None
+        self.overflows = 0
+        self.reader_overruns = 0
+        self.callbacks = 0
+
+    @property
+    def running(self):
+        return self._stream is not None
+
+    def _find_device(self):
+        """Returns the input device index matching device_pattern, using the process-wide cache."""
+        if not self.device_pattern:
+            return None
+        key = self.device_pattern.lower()
+        if key in _device_cache:
+            return _device_cache[key]
+        for i in range(self._audio.get_device_count()):
+            info = self._audio.get_device_info_by_index(i)
+            if info.get('maxInputChannels', 0) > 0 and key in info.get('name', '').lower():
+                log.debug("Matched input device {}: {}".format(i, info.get('name')))
+                _device_cache[key] = i
+                return i
+        log.warning("No input device matching '{}'. Using default.".format(self.device_pattern))
+        _device_cache[key] = None
+        return None
+
+    def start(self):
+        """Opens the input stream. Returns True if capture is running."""
+        if self.running:
+            return True
+        try:
+            self._audio = pyaudio.PyAudio()
+            self.device_index = self._find_device()
+            self._stream = self._audio.open(format=self.format, channels=self.channels, rate=self.rate,
+                                            input=True, frames_per_buffer=self.chunk,
+                                            input_device_index=self.device_index,
+                                            stream_callback=self._callback)
+            self._stream.start_stream()
+            log.info("Audio capture started (device {}, {}Hz, {} byte ring)".format(
+                self.device_index if self.device_index is not None else "default", self.rate, self.capacity))
+            return True
+        except Exception as e:
+            log.error("Could not start audio capture: {}".format(e), exc_info=True)
+            self.stop()
+            return False
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        """PortAudio callback. Copies the chunk into the ring and wakes readers."""
+        if status & pyaudio.paInputOverflow:
+            self.overflows += 1
+            OVERFLOWS.inc()
+        data = memoryview(in_data)
+        n = len(data)
+        if n > self.capacity:
+            data = data[n - self.capacity:]
+            n = self.capacity
+        with self._cond:
+            pos = self._write_total % self.capacity
+            first = min(n, self.capacity - pos)
+            self._ring_view[pos:pos + first] = data[:first]
+            if first < n:
+                self._ring_view[0:n - first] = data[first:]
+            self._write_total += n
+            self.callbacks += 1
+            self._cond.notify_all()
+        return (None, pyaudio.paContinue)
+
+    def cursor(self, seconds_back=0):
+        """
+        Returns a read position for a new consumer.
+
+        Args:
+            seconds_back (float): Start this far in the past (pre-roll), limited to what the ring holds.
+        """
+        with self._cond:
+            back = int(seconds_back * self.rate) * self.channels * self.sample_width
+            back = min(back, self.capacity - self.chunk_bytes, self._write_total)
+            return self._write_total - back
+
+    def read(self, cursor, nbytes, timeout=1.0):
+        """
+        Blocks until nbytes are available after cursor.
+
+        Returns:
+            (bytes, int): The data and the advanced cursor. Data is empty on timeout or if capture stopped.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            start = self._wait_for(cursor, nbytes, deadline)
+            if start is None:
+                return b'', cursor
+            pos = start % self.capacity
+            end = pos + nbytes
+            if end <= self.capacity:
+                data = bytes(self._ring_view[pos:end])
+            else:
+                data = bytes(self._ring_view[pos:]) + bytes(self._ring_view[:end - self.capacity])
+        return data, start + nbytes
+
+    def read_into(self, cursor, buffer, timeout=1.0):
+        """
+        Like read(), but copies len(buffer) bytes into a caller-owned buffer instead of
+        allocating, so a long consumer can reuse one buffer for every chunk.
+
+        Returns:
+            (int, int): Bytes copied (0 on timeout or if capture stopped) and the advanced cursor.
+        """
+        view = memoryview(buffer).cast('B')
+        nbytes = len(view)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            start = self._wait_for(cursor, nbytes, deadline)
+            if start is None:
+                return 0, cursor
+            pos = start % self.capacity
+            first = min(nbytes, self.capacity - pos)
+            view[:first] = self._ring_view[pos:pos + first]
+            if first < nbytes:
+                view[first:] = self._ring_view[:nbytes - first]
+        return nbytes, start + nbytes
+
+    def _wait_for(self, cursor, nbytes, deadline):
+        """Waits for nbytes after cursor. Returns the cursor (moved up if overrun), or None on timeout. Caller holds _cond."""
+        while self._write_total - cursor < nbytes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.running:
+                return None
+            self._cond.wait(remaining)
+        if self._write_total - cursor > self.capacity:
+            self.reader_overruns += 1
+            cursor = self._write_total - self.capacity
+        return cursor
+
+    def chunks(self, seconds, should_stop=None, cursor=None, buffer=None):
+        """
+        Generator yielding chunk-sized blocks of audio for `seconds`.
+
+        Args:
+            seconds (float): Duration to read, or None to read until should_stop() or a stall.
+            should_stop (callable): Checked before each chunk; stops the generator when it returns True.
+            cursor (int): Start position from cursor(). Defaults to now.
+            buffer (bytearray): If given (chunk_bytes long), every chunk is copied into it and
+                                the same memoryview is yielded each time, so consume it before
+                                advancing. Defaults to a new bytes object per chunk.
+        """
+        if cursor is None:
+            cursor = self.cursor()
+        view = memoryview(buffer).cast('B')[:self.chunk_bytes] if buffer is not None else None
+        if view is not None and len(view) < self.chunk_bytes:
+            raise ValueError("buffer must hold at least {} bytes".format(self.chunk_bytes))
+        chunk_numbers = itertools.count() if seconds is None else range(int(self.rate / self.chunk * seconds))
+        for i in chunk_numbers:
+            if should_stop and should_stop():
+                return
+            if view is None:
+                data, cursor = self.read(cursor, self.chunk_bytes)
+            else:
+                n, cursor = self.read_into(cursor, view)
+                data = view if n else None
+            if not data:
+                log.warning("Audio capture stalled after {} chunks.".format(i))
+                return
+            yield data
+
+    def stats(self):
+        """Returns capture counters as a dict."""
+        return {
+            'running': self.running,
+            'device_index': self.device_index,
+            'bytes_captured': self._write_total,
+            'callbacks': self.callbacks,
+            'overflows': self.overflows,
+            'reader_overruns': self.reader_overruns,
+        }
+
+    def stop(self):
+        """Closes the stream and releases PortAudio."""
+        stream, self._stream = self._stream, None
+        if stream:
+            try:
+                if stream.is_active(): stream.stop_stream()
+                stream.close()
+            except Exception: pass
+        if self._audio:
+            try: self._audio.terminate()
+            except Exception: pass
+            self._audio = None
+        with self._cond:
+            self._cond.notify_all()
+        log.debug("Audio capture stopped.")
@@ -0,0 +1,199 @@
+import logging
+import queue
+import threading
+import time
+
+from modules import Trace
+from modules import Metrics
+
+log = logging.getLogger("EXECUTOR")
+
+INLINE = "inline"             # Run in the receiving thread
+POOL = "pool"                 # Queue for the shared workers; drop if the queue is full
+DROP_IF_BUSY = "drop_if_busy" # Drop while a previous call for the same address is queued or running
+LATEST = "latest"             # While busy, keep only the newest call and run it next
+POLICIES = (INLINE, POOL, DROP_IF_BUSY, LATEST)
+
+_STOP = object()
+
+RECEIVED = Metrics.counter("phone_osc_received_total", "Messages received for a subscribed address", labels=("address",))
+DROPPED = Metrics.counter("phone_osc_dropped_total", "Handler calls dropped because the handler or queue was busy", labels=("address",))
+HANDLER_SECONDS = Metrics.histogram("phone_osc_handler_seconds", "Handler run time", labels=("address",))
+
+
+class _Handler:
+    """One subscribed callback, its policy and its counters."""
+
+    def __init__(self, address, callback, policy):
+        self.address = address
+        self.callback = callback
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.busy = False
+        self.pending = None
+        self.received = RECEIVED.labels(address)
+        self.dropped_total = DROPPED.labels(address)
+        self.runtime = HANDLER_SECONDS.labels(address)
+        self.calls = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.runtime_total = 0.0
+        self.runtime_max = 0.0
+
+
+class HandlerExecutor:
+    """
+    Runs message callbacks according to a per-handler execution policy on a small,
+    shared pool of worker threads with a bounded queue.
+
+    A slow handler can only ever occupy one worker per address (drop_if_busy/latest)
+    or one queue slot per call (pool); once the queue is full, further calls are
+    dropped and counted instead of piling up threads.
+
+    Attributes:
+        workers (int): Number of worker threads.
+        queue_size (int): Maximum number of queued calls.
+    """
+
+    def __init__(self, workers=2, queue_size=32):
+        """
+        Args:
+            workers (int): Worker threads. Defaults to 2.
+            queue_size (int): Queue bound. Defaults to 32.
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._handlers = []
+        self._stopped = False
+        self.max_queue_depth = 0
+
+    def wrap(self, address, callback, policy=INLINE):
+        """
+        Returns a dispatcher-compatible function that runs callback under policy.
+
+        Raises:
+            ValueError: If policy is unknown.
+        """
+        if policy not in POLICIES:
+            raise ValueError("policy must be one of {}".format(POLICIES))
+        handler = _Handler(address, callback, policy)
+        with self._lock:
+            self._handlers.append(handler)
+        def dispatch(msg_address, *args):
+            self.submit(handler, (msg_address,) + args)
+        dispatch.__name__ = getattr(callback, '__name__', 'handler')
+        return dispatch
+
+    def start(self):
+        """Starts the worker threads if they aren't running."""
+        with self._lock:
+            if self._threads or self._stopped:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name="osc-worker-{}".format(i))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=1.0):
+        """Stops the workers after the calls already queued. Queued-policy calls submitted afterwards are dropped; inline calls still run."""
+        with self._lock:
+            self._stopped = True
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.join(timeout=timeout)
+
+    def submit(self, handler, args):
+        """Runs or queues one call according to the handler's policy."""
+        handler.received.inc()
+        if handler.policy == INLINE:
+            self._run(handler, args)
+            return
+        if self._stopped:
+            # A datagram can still arrive while the server shuts down; don't restart the workers for it.
+            with handler.lock:
+                handler.dropped += 1
+            handler.dropped_total.inc()
+            return
+        if not self._threads:
+            self.start()
+        if handler.policy in (DROP_IF_BUSY, LATEST):
+            with handler.lock:
+                if handler.busy:
+                    if handler.policy == LATEST:
+                        if handler.pending is not None:
+                            handler.coalesced += 1
+                        handler.pending = args
+                    else:
+                        handler.dropped += 1
+                        handler.dropped_total.inc()
+                    return
+                handler.busy = True
+        try:
+            self._queue.put_nowait((handler, args))
+        except queue.Full:
+            with handler.lock:
+                handler.dropped += 1
+                handler.busy = False
+            handler.dropped_total.inc()
+            log.debug("Handler queue full. Dropped call for {}".format(handler.address))
+            return
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            handler, args = item
+            while args is not None:
+                self._run(handler, args)
+                args = None
+                if handler.policy in (DROP_IF_BUSY, LATEST):
+                    with handler.lock:
+                        # Run the newest coalesced call on this worker so calls for one address stay ordered.
+                        args, handler.pending = handler.pending, None
+                        if args is None:
+                            handler.busy = False
+
+    def _run(self, handler, args):
+        start = time.monotonic()
+        try:
+            handler.callback(*args)
+        except Exception as e:
+            log.error("Error in handler for {}: {}".format(handler.address, e), exc_info=True)
+        elapsed = time.monotonic() - start
+        Trace.record("osc.handle", "osc", start, elapsed, {'address': handler.address})
+        handler.runtime.observe(elapsed)
+        with handler.lock:
+            handler.calls += 1
+            handler.runtime_total += elapsed
+            if elapsed > handler.runtime_max:
+                handler.runtime_max = elapsed
+
+    def stats(self):
+        """Returns queue depth and per-address counters."""
+        with self._lock:
+            handlers = list(self._handlers)
+        per_address = {}
+        for h in handlers:
+            per_address[h.address] = {
+                'policy': h.policy,
+                'calls': h.calls,
+                'dropped': h.dropped,
+                'coalesced': h.coalesced,
+                'mean_runtime_ms': (h.runtime_total / h.calls * 1000) if h.calls else 0.0,
+                'max_runtime_ms': h.runtime_max * 1000,
+            }
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'handlers': per_address,
+        }
@@ -13,10 +13,28 @@ import threading
 import struct
 import math
 import sys
+import hashlib
+
+from modules.SoundCache import SoundCache
+from modules.AudioCapture import AudioCapture
+from modules.WavWriter import WavWriter
+from modules import Trace
+from modules import Metrics
 
 # --- Configuration ---
 LOGLEVEL = os.environ.get("LOGLEVEL", "INFO")
 TMP_DIR = "tmp"
+SAMPLE_RATE = 44100
+CHUNK = 1024
+REC_FORMAT = pyaudio.paInt16
+REC_CHANNELS = 1
+SAMPLE_WIDTH = 2
+CAPTURE_BUFFER_SECONDS = float(os.environ.get("CAPTURE_BUFFER_SECONDS", 10))
+BARGE_IN_MAX_SECONDS = 600 # Upper bound on a single barge-in scan; playback ending normally stops it first
+CAPTURE_DEVICE = os.environ.get("CAPTURE_DEVICE") # Input device name substring, default device if unset
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join("cache", "tts"))
+ESPEAK = "/usr/bin/espeak"
+SOUND_CACHE_BYTES = int(os.environ.get("SOUND_CACHE_BYTES", 64 * 1024 * 1024))
 
 # --- Logging Setup ---
 logging.basicConfig(level=LOGLEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -24,25 +42,89 @@ log = logging.getLogger("HANDSET")
 
 # --- Pygame Event ---
 PLAYBACK_FINISHED_EVENT = pygame.USEREVENT + 1
+PUMP_STOP_EVENT = pygame.USEREVENT + 2
+PLAYBACK_POLL_SECONDS = 1.0 # Safety net in case an end event is missed
+
+PLAYBACKS = Metrics.counter("phone_playbacks_total", "Sounds started on the handset")
+PLAYBACK_ERRORS = Metrics.counter("phone_playback_errors_total", "Sounds that failed to start")
+LISTEN_RESULTS = Metrics.counter("phone_listen_results_total", "Listen outcomes", labels=("result",))
+LISTEN_SECONDS = Metrics.histogram("phone_listen_seconds", "Time from starting to listen to a result", labels=("result",))
+RECORDINGS = Metrics.counter("phone_recordings_total", "record() calls", labels=("saved",))
+
+class PlaybackHandle:
+    """
+    Completion handle for one sound started on the audio channel.
+
+    Resolved by the Handset event pump thread when the channel ends, or straight
+    away when the sound is replaced, stopped or the phone is hung up. Any number
+    of threads can wait() on the same handle.
+
+    Attributes:
+        filename (str): The file being played.
+        completed (bool): True if played to the end, False if cut short, None while playing.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.completed = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until resolved. Returns True if resolved within timeout."""
+        return self._event.wait(timeout)
+
+    def add_done_callback(self, fn):
+        """Calls fn(handle) once resolved, immediately if it already is."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _resolve(self, completed):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.completed = completed
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try: fn(self)
+            except Exception as e: log.error("Error in playback done callback: {}".format(e), exc_info=True)
+
 
 class Handset:
 
     audioChannel = None
     soundVolume = 1
     pool = None
+    sound_cache = None
+    capture = None
     speech_speed = "150"
+    speech_voice = "en"
+    speech_min_duration = 0.15 # Seconds of continuous loud audio that count as speech
+    archive_recordings = False # Keep listen captures in TMP_DIR for threshold tuning
+    preroll_seconds = 0.5 # Audio from just before listening starts that is scanned too
 
     onHook = True
     _is_listening = False
     _listen_lock = threading.Lock()
+    _current_playback = None
+    _pump_thread = None
+    _capture_thread = None
 
-    def __init__(self):
+    def __init__(self, sound_cache_bytes=SOUND_CACHE_BYTES):
         log.debug("Initializing handset")
         self.onHook = True
+        self.sound_cache = SoundCache(max_bytes=sound_cache_bytes)
+        self._stop_recording = threading.Event()
+        self._playback_lock = threading.Lock()
         try:
-            os.makedirs(TMP_DIR, exist_ok=True)
-            log.debug("Ensured temporary directory exists: {}".format(TMP_DIR))
-
             # --- Initialize Pygame Mixer and Display ---
             # Display init is needed for event pump, even if headless.
             # Ensure SDL_VIDEODRIVER is set appropriately (e.g., 'dummy')
@@ -58,6 +140,11 @@ class Handset:
             self.pool = Pool(max_workers=2)
             log.debug("Thread pool initialized.")
 
+            self._pump_running = True
+            self._pump_thread = threading.Thread(target=self._event_pump, name="handset-events")
+            self._pump_thread.daemon = True
+            self._pump_thread.start()
+
         except pygame.error as e:
             # Using .format()
             log.error("Pygame mixer or display init failed: {}. Audio/Events might not work.".format(e), exc_info=True)
@@ -68,6 +155,59 @@ class Handset:
             self.audioChannel = None
             self.pool = None
 
+        # Capture stays open for the life of the Handset so each listen starts instantly.
+        # Opening PortAudio is slow, so it happens in the background rather than holding up startup.
+        self.capture = AudioCapture(rate=SAMPLE_RATE, channels=REC_CHANNELS, chunk=CHUNK, fmt=REC_FORMAT, device_pattern=CAPTURE_DEVICE, buffer_seconds=CAPTURE_BUFFER_SECONDS)
+        self._capture_thread = threading.Thread(target=self._start_capture, name="capture-start")
+        self._capture_thread.daemon = True
+        self._capture_thread.start()
+
+    def _start_capture(self):
+        if not self.capture.start():
+            log.error("Audio capture failed to start. Recording and listening are unavailable.")
+
+    def _event_pump(self):
+        """Sole consumer of the pygame event queue. Turns channel end events into handle completion."""
+        log.debug("Event pump thread started.")
+        while self._pump_running:
+            try:
+                event = pygame.event.wait()
+            except pygame.error as e:
+                log.error("Event pump stopped: {}".format(e))
+                break
+            if event.type == PLAYBACK_FINISHED_EVENT:
+                self._finish_playback(True, only_if_idle=True)
+            elif event.type == pygame.QUIT:
+                log.warning("Pygame quit event received.")
+                self.onHook = True
+                self._finish_playback(False)
+        log.debug("Event pump thread exiting.")
+
+    def _finish_playback(self, completed, only_if_idle=False):
+        """Resolves the current playback handle. End events that arrive while a newer sound plays are ignored."""
+        with self._playback_lock:
+            handle = self._current_playback
+            if handle is None:
+                return
+            if only_if_idle and self.audioChannel and self.audioChannel.get_busy():
+                return
+            self._current_playback = None
+        log.debug("Playback of '{}' {}.".format(handle.filename, "finished" if completed else "interrupted"))
+        handle._resolve(completed)
+
+    def _start_sound(self, filename, loops=0):
+        """Starts a cached sound on the channel and returns its PlaybackHandle."""
+        s = self.sound_cache.get(filename)
+        s.set_volume(self.soundVolume)
+        handle = PlaybackHandle(filename)
+        with self._playback_lock:
+            previous, self._current_playback = self._current_playback, handle
+            self.audioChannel.stop() # Stop previous sound first
+            self.audioChannel.play(s, loops=loops)
+        if previous is not None:
+            previous._resolve(False)
+        return handle
+
     # ... ( _submit_task method remains the same ) ...
     def _submit_task(self, func, *args, **kwargs):
         """Helper to submit tasks to the pool and log errors."""
@@ -94,37 +234,43 @@ class Handset:
             log.debug("Background task completed successfully. Result: {}".format(future.result()))
 
     # ... ( play_file method remains the same ) ...
+    @Trace.traced("handset.play_file", "audio")
     def play_file(self, filename):
-        """Plays a file non-blockingly. Stops previous sound on the channel."""
+        """Plays a file non-blockingly. Stops previous sound on the channel. Returns a PlaybackHandle, or False on error."""
         if not self.audioChannel:
             log.error("Audio channel not initialized. Cannot play file.")
             return False
         log.info("Playing file: {}".format(filename))
         try:
-            s = mixer.Sound(filename)
-            s.set_volume(self.soundVolume)
-            self.audioChannel.stop() # Stop previous sound first
-            self.audioChannel.play(s)
-            return True
-        except pygame.error as e:
+            handle = self._start_sound(filename)
+        except (pygame.error, OSError) as e:
+            PLAYBACK_ERRORS.inc()
             log.error("Error playing sound file {}: {}".format(filename, e))
             return False
+        PLAYBACKS.inc()
+        return handle
 
     def loop_file(self, filename):
-        """Plays a file on loop non-blockingly. Stops previous sound on the channel."""
+        """Plays a file on loop non-blockingly. Stops previous sound on the channel. Returns a PlaybackHandle, or False on error."""
         if not self.audioChannel:
             log.error("Audio channel not initialized. Cannot loop file.")
             return False
         log.info("Looping file: {}".format(filename))
         try:
-            s = mixer.Sound(filename)
-            s.set_volume(self.soundVolume)
-            self.audioChannel.stop() # Stop previous sound first
-            self.audioChannel.play(s, loops=-1) # loops=-1 means infinite loop
-            return True
-        except pygame.error as e:
+            handle = self._start_sound(filename, loops=-1) # loops=-1 means infinite loop
+        except (pygame.error, OSError) as e:
+            PLAYBACK_ERRORS.inc()
             log.error("Error looping sound file {}: {}".format(filename, e))
             return False
+        PLAYBACKS.inc()
+        return handle
+
+    def preload_sounds(self, directory):
+        """Decodes all sounds in a directory into the sound cache so first playback skips disk I/O."""
+        if not mixer.get_init():
+            log.error("Mixer not initialized. Cannot preload sounds.")
+            return 0
+        return self.sound_cache.preload(directory)
 
     def stop_loop(self):
         """Stops any currently playing/looping sound on the audio channel."""
@@ -133,174 +279,303 @@ class Handset:
             return
         log.info("Stopping looped file.")
         self.audioChannel.stop()
+        self._finish_playback(False)
 
     # ... ( speak method remains the same ) ...
-    def speak(self, text, cb=None, sleep=0):
-        """Uses espeak TTS in a background thread."""
+    def _tts_path(self, text, voice=None):
+        """Cache file for a phrase. The key covers text, speech_speed and voice so changing either re-renders."""
+        key = "{}|{}|{}".format(self.speech_speed, voice or self.speech_voice, text)
+        return os.path.join(TTS_CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".wav")
+
+    def render_speech(self, text, voice=None):
+        """Renders text to a cached WAV with espeak if not already on disk. Returns the path, or None on error."""
+        path = self._tts_path(text, voice)
+        if os.path.exists(path):
+            return path
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        tmp_path = path + ".part"
+        try:
+            start = time.monotonic()
+            subprocess.check_call([ESPEAK, "-s", self.speech_speed, "-v", voice or self.speech_voice, "-w", tmp_path, text], shell=False)
+            os.replace(tmp_path, path)
+            log.debug("Rendered TTS '{}' to {} in {:.0f}ms".format(text, path, (time.monotonic() - start) * 1000))
+            return path
+        except FileNotFoundError:
+            log.error("espeak command not found. Please install espeak.")
+        except Exception as e:
+            log.error("Error executing espeak: {}".format(e))
+        try: os.remove(tmp_path)
+        except OSError: pass
+        return None
+
+    def pre_render_speech(self, phrases, voice=None):
+        """Renders and decodes known phrases ahead of time so speak() on them plays like play_file. Returns count ready."""
+        ready = 0
+        for text in phrases:
+            path = self.render_speech(text, voice)
+            if not path:
+                continue
+            try:
+                if mixer.get_init(): self.sound_cache.get(path)
+                ready += 1
+            except (pygame.error, OSError) as e:
+                log.warning("Could not load rendered TTS '{}': {}".format(text, e))
+        log.info("Pre-rendered {}/{} TTS phrases".format(ready, len(phrases)))
+        return ready
+
+    def _after_speak(self, handle, cb, sleep):
+        if sleep > 0: time.sleep(sleep)
+        if cb: cb(handle)
+
+    def _play_speech(self, path, cb, sleep):
+        if self.onHook:
+            log.info("Hung up before TTS playback.")
+            return None
+        handle = self.play_file(path)
+        if handle and (cb or sleep > 0):
+            # Done callbacks run on the event pump thread, so hand the user callback to the pool.
+            handle.add_done_callback(lambda h: self._submit_task(self._after_speak, h, cb, sleep))
+        return handle
+
+    def speak(self, text, cb=None, sleep=0, voice=None):
+        """
+        Speaks text through the handset audio channel using cached espeak renders.
+
+        A phrase is rendered to TTS_CACHE_DIR the first time it is used (in a background
+        thread) and replayed from the sound cache afterwards. Playback stops on hang-up
+        like any other prompt. cb(handle) is called with the PlaybackHandle once speech ends.
+        Returns the PlaybackHandle on a cache hit, otherwise None.
+        """
         log.info("Requesting TTS: '{}'".format(text))
         if self.onHook:
             log.warning("Cannot speak, phone is on hook.")
-            return
+            return None
+        if not self.audioChannel:
+            log.error("Audio channel not initialized. Cannot speak.")
+            return None
+        path = self._tts_path(text, voice)
+        if os.path.exists(path):
+            return self._play_speech(path, cb, sleep)
         if not self.pool:
              log.error("Thread pool not available. Cannot submit speak task.")
-             return
+             return None
         def task():
-             try:
-                 subprocess.call(["/usr/bin/espeak", "-s", self.speech_speed, text], shell=False)
-             except FileNotFoundError:
-                  log.error("espeak command not found. Please install espeak.")
-             except Exception as e:
-                  log.error("Error executing espeak: {}".format(e))
-        future = self._submit_task(task)
-        if future:
-            if cb: future.add_done_callback(cb)
-            if sleep > 0:
-                future.add_done_callback(lambda f, s=sleep: time.sleep(s))
-
-    # ... ( record method remains the same ) ...
-    def record(self, seconds=5, filename=os.path.join(TMP_DIR,'recording.wav')):
-        """Records audio for a duration. Returns True if recording saved, False otherwise."""
+            rendered = self.render_speech(text, voice)
+            if rendered:
+                self._play_speech(rendered, cb, sleep)
+        self._submit_task(task)
+        return None
+
+    def _capture_chunks(self, seconds, cursor=None, should_stop=None, buffer=None):
+        """
+        Generator yielding raw mic chunks for up to `seconds`. Stops early on hang-up while listening or when should_stop() is True.
+        With a buffer, each chunk is the same reused memoryview (see AudioCapture.chunks).
+        """
+        if not self.capture or not self.capture.running:
+            log.error("Audio capture not running. Cannot record.")
+            return
+        hung_up = lambda: self.onHook and self._is_listening
+        stop = hung_up if should_stop is None else (lambda: hung_up() or should_stop())
+        for data in self.capture.chunks(seconds, should_stop=stop, cursor=cursor, buffer=buffer):
+            yield data
+        if hung_up():
+            log.warning("Hang up detected during recording loop (in listening mode). Stopping early.")
+
+    def _write_wav(self, filename, frames):
+        """Writes captured chunks to a mono 16-bit WAV file."""
+        with WavWriter(filename, SAMPLE_RATE, REC_CHANNELS, SAMPLE_WIDTH) as writer:
+            for data in frames:
+                writer.write(data)
+
+    @Trace.traced("handset.record", "audio")
+    def record(self, seconds=5, filename=os.path.join(TMP_DIR,'recording.wav'), segment_seconds=None):
+        """
+        Records audio straight to a WAV file as it is captured. Returns True if recording saved, False otherwise.
+
+        Chunks are copied into one reused buffer and appended to the file, so memory stays
+        flat however long the recording runs, and a crash mid-record still leaves a playable
+        file (see modules.WavWriter).
+
+        Args:
+            seconds (float): Duration, or None to record until stop_recording() or hang-up.
+            filename (str): Output WAV file.
+            segment_seconds (float): Split into numbered files (recording-000.wav, ...) of this length. Defaults to one file.
+        """
         if self.onHook:
             log.warning("Cannot record, phone is on hook.")
             return False
         log.info("Recording audio for {}s to {}...".format(seconds, filename))
-        rec_format = pyaudio.paInt16
-        rec_channels = 1
-        sample_rate = 44100
-        chunk = 1024
-        audio = None
-        stream = None
-        frames = []
-        recording_started = False
+        self._stop_recording.clear()
+        buffer = bytearray(self.capture.chunk_bytes) if self.capture else None
+        writer = WavWriter(filename, SAMPLE_RATE, REC_CHANNELS, SAMPLE_WIDTH, segment_seconds=segment_seconds)
+        stop = lambda: self.onHook or self._stop_recording.is_set() # Hanging up finalises the file
         success = False
         try:
-            audio = pyaudio.PyAudio()
-            stream = audio.open(format=rec_format, channels=rec_channels, rate=sample_rate, input=True, frames_per_buffer=chunk)
-            recording_started = True
-            log.debug("Audio stream opened for recording.")
-            total_chunks = int(sample_rate / chunk * seconds)
-            for i in range(total_chunks):
-                if self.onHook and self._is_listening:
-                    log.warning("Hang up detected during recording loop (in listening mode). Stopping early.")
-                    break
-                try:
-                    data = stream.read(chunk, exception_on_overflow=False)
-                    frames.append(data)
-                except IOError as e:
-                    if e.errno == pyaudio.paInputOverflowed: log.warning("Audio input overflowed. Skipping chunk.")
-                    else: raise
-            log.debug("Recording loop finished. Recorded {} chunks.".format(len(frames)))
-            if frames:
-                log.debug("Saving {} frames to {}".format(len(frames), filename))
-                os.makedirs(os.path.dirname(filename), exist_ok=True)
-                with wave.open(filename, 'wb') as wf:
-                    wf.setnchannels(rec_channels)
-                    sample_width = 2
-                    try: sample_width = audio.get_sample_size(rec_format)
-                    except Exception: pass
-                    wf.setsampwidth(sample_width)
-                    wf.setframerate(sample_rate)
-                    wf.writeframes(b''.join(frames))
-                log.debug("Recording successfully saved to {}".format(filename))
-                success = True
-            else:
-                log.warning("No frames captured, not saving file {}".format(filename))
+            for data in self._capture_chunks(seconds, should_stop=stop, buffer=buffer):
+                writer.write(data)
         except Exception as e:
             log.error("Error during PyAudio recording: {}".format(e), exc_info=True)
         finally:
-            if stream:
-                try:
-                    if recording_started and stream.is_active(): stream.stop_stream()
-                    stream.close()
-                    log.debug("Audio stream closed.")
-                except Exception: pass
-            if audio:
-                try: audio.terminate()
-                except Exception: pass
-            log.debug("PyAudio terminated.")
+            try:
+                writer.close()
+            except OSError as e:
+                log.error("Could not finish recording {}: {}".format(filename, e))
+        if writer.frames_written:
+            log.debug("Recorded {:.1f}s to {}".format(writer.seconds_written, ", ".join(writer.paths)))
+            success = True
+        else:
+            log.warning("No frames captured, not saving file {}".format(filename))
+        RECORDINGS.labels("true" if success else "false").inc()
         return success
 
-    # ... ( _wait_for_playback_or_hangup method remains the same ) ...
-    def _wait_for_playback_or_hangup(self, filename):
-        """Waits for audio playback to finish or phone to be hung up."""
-        if not self.audioChannel or not self.audioChannel.get_busy():
-            log.warning("Playback of {} didn't start or was instant.".format(filename))
+    def stop_recording(self):
+        """Ends a record() in progress after the current chunk."""
+        self._stop_recording.set()
+
+    def _wait_for_playback_or_hangup(self, handle):
+        """Waits for audio playback to finish or phone to be hung up. Returns True if it played to the end."""
+        if not self.audioChannel or handle.done() or not self.audioChannel.get_busy():
+            log.warning("Playback of {} didn't start or was instant.".format(handle.filename))
             return False
-        log.debug("Waiting for '{}' playback to finish or hang-up...".format(filename))
-        playback_normally_completed = False
-        while not self.onHook:
-            event_handled = False
-            for event in pygame.event.get():
-                if event.type == PLAYBACK_FINISHED_EVENT:
-                     if not self.audioChannel.get_busy():
-                         log.debug("Playback finished event received.")
-                         playback_normally_completed = True
-                         event_handled = True
-                         break
-                elif event.type == pygame.QUIT:
-                     log.warning("Pygame quit event detected during wait.")
-                     self.onHook = True
-                     event_handled = True
-                     break
-            if event_handled and (playback_normally_completed or self.onHook):
-                 break
-            if self.onHook: break
-            time.sleep(0.05)
-        return playback_normally_completed
-
-    # ... ( _record_and_analyze method remains the same ) ...
-    def _record_and_analyze(self, listen_duration, silence_threshold):
-        """Performs recording and analysis. Returns 'speech', 'silence', or 'error'."""
-        record_filename = os.path.join(TMP_DIR, "listen_rec_{}.wav".format(int(time.time())))
-        log.debug("Recording for {}s to {}".format(listen_duration, record_filename))
-        self._is_listening = True
-        recorded_ok = self.record(seconds=listen_duration, filename=record_filename)
-        self._is_listening = False
+        log.debug("Waiting for '{}' playback to finish or hang-up...".format(handle.filename))
+        while not handle.wait(PLAYBACK_POLL_SECONDS):
+            if self.onHook or not self.audioChannel.get_busy():
+                self._finish_playback(not self.onHook, only_if_idle=True)
+                break
+        return bool(handle.completed) and not self.onHook
+
+    def _scan_for_speech(self, chunks, silence_threshold, frames=None):
+        """
+        Consumes chunks until the RMS stays above silence_threshold for speech_min_duration.
+
+        Returns:
+            (bool, int, int): Whether sustained speech was found, chunks scanned, peak RMS.
+        """
+        speech_bytes_needed = max(1, int(self.speech_min_duration * SAMPLE_RATE)) * SAMPLE_WIDTH * REC_CHANNELS
+        scanned = 0
+        loud_run = 0
+        peak_rms = 0
+        for data in chunks:
+            scanned += 1
+            if frames is not None: frames.append(data)
+            rms = audioop.rms(data, SAMPLE_WIDTH)
+            peak_rms = max(peak_rms, rms)
+            if rms > silence_threshold:
+                loud_run += len(data)
+                if loud_run >= speech_bytes_needed:
+                    return True, scanned, peak_rms
+            else:
+                loud_run = 0
+        return False, scanned, peak_rms
+
+    @Trace.traced("handset.listen", "audio")
+    def _record_and_analyze(self, listen_duration, silence_threshold, preroll=0, scanned_until=None):
+        """
+        Scores mic chunks in memory as they arrive. Returns 'speech', 'silence', or 'error'.
+
+        Returns 'speech' as soon as the chunk RMS stays above silence_threshold for
+        speech_min_duration; otherwise listens for the full listen_duration before
+        returning 'silence'. `preroll` seconds of already-captured audio are scanned
+        first so an answer that started over the end of the prompt is not cut off, but
+        not audio before `scanned_until` (a capture position), which was already scanned
+        for barge-in. Nothing is written to TMP_DIR unless archive_recordings is set.
+        """
+        frames = [] if self.archive_recordings else None
+        started = time.monotonic()
         analysis_result = "error"
+        self._is_listening = True
+        cursor = None
+        if self.capture and self.capture.running:
+            now = self.capture.cursor()
+            cursor = self.capture.cursor(seconds_back=preroll)
+            if scanned_until is not None:
+                cursor = min(now, max(cursor, scanned_until))
+            preroll = (now - cursor) / float(self.capture.rate * self.capture.channels * self.capture.sample_width)
+        log.debug("Listening for {}s + {:.2f}s pre-roll (threshold {}, sustained {}s)".format(
+            listen_duration, preroll, silence_threshold, self.speech_min_duration))
+        chunks = self._capture_chunks(listen_duration + preroll, cursor=cursor)
+        try:
+            speech, scanned, peak_rms = self._scan_for_speech(chunks, silence_threshold, frames)
+            if speech:
+                log.debug("Sustained speech after {} chunks (threshold {})".format(scanned, silence_threshold))
+                analysis_result = "speech"
+            elif scanned:
+                log.debug("No sustained speech in {} chunks (peak RMS {}, threshold {})".format(scanned, peak_rms, silence_threshold))
+                analysis_result = "silence"
+            else:
+                log.warning("No audio captured while listening.")
+        except Exception as e:
+            log.error("Error during streaming speech analysis: {}".format(e), exc_info=True)
+            analysis_result = "error"
+        finally:
+            chunks.close()
+            self._is_listening = False
         if self.onHook:
             log.info("Hung up during/after recording. Discarding result.")
-        elif recorded_ok and os.path.exists(record_filename):
-            log.debug("Analyzing recording: {}".format(record_filename))
+            analysis_result = "error"
+        LISTEN_RESULTS.labels(analysis_result).inc()
+        LISTEN_SECONDS.labels(analysis_result).observe(time.monotonic() - started)
+        if frames:
+            archive_filename = os.path.join(TMP_DIR, "listen_rec_{}.wav".format(int(time.time())))
             try:
-                with wave.open(record_filename, 'rb') as wf:
-                    n_frames = wf.getnframes()
-                    if n_frames > 0:
-                        frames = wf.readframes(n_frames)
-                        width = wf.getsampwidth()
-                        rms = audioop.rms(frames, width)
-                        log.debug("Analyzed RMS: {}, Threshold: {}".format(rms, silence_threshold))
-                        analysis_result = "speech" if rms > silence_threshold else "silence"
-                    else:
-                         log.debug("Recording appears empty (0 frames).")
-                         analysis_result = "silence"
+                self._write_wav(archive_filename, frames)
+                log.debug("Archived listen recording to {}".format(archive_filename))
             except Exception as e:
-                log.error("Error analyzing audio file {}: {}".format(record_filename, e), exc_info=True)
-                analysis_result = "error"
-        else:
-             log.warning("Recording file {} not found or empty after recording attempt.".format(record_filename))
-             analysis_result = "error"
-        if os.path.exists(record_filename):
-             try: os.remove(record_filename)
-             except OSError as e: log.warning("Could not remove temp recording {}: {}".format(record_filename, e))
+                log.warning("Could not archive listen recording {}: {}".format(archive_filename, e))
         return analysis_result
 
-    # ... ( _do_play_and_listen_task method remains the same ) ...
-    def _do_play_and_listen_task(self, filename, on_speech_cb, on_silence_cb, listen_duration, silence_threshold):
+    def _listen_during_playback(self, handle, barge_in_threshold):
+        """
+        Scans the mic while the prompt plays. On sustained speech the prompt is cut off.
+
+        Returns:
+            (bool, int): True if the caller barged in (False if playback ended or the phone
+                         was hung up), and the capture position the scan reached, or None.
+        """
+        filename = handle.filename
+        if not self.audioChannel or handle.done():
+            log.warning("Playback of {} didn't start or was instant.".format(filename))
+            return False, None
+        log.debug("Listening for barge-in during '{}' (threshold {})".format(filename, barge_in_threshold))
+        playback_over = lambda: self.onHook or handle.done()
+        cursor = self.capture.cursor() if self.capture and self.capture.running else None
+        self._is_listening = True
+        chunks = self._capture_chunks(BARGE_IN_MAX_SECONDS, cursor=cursor, should_stop=playback_over)
+        try:
+            speech, scanned, peak_rms = self._scan_for_speech(chunks, barge_in_threshold)
+        finally:
+            chunks.close()
+            self._is_listening = False
+        scanned_until = cursor + scanned * self.capture.chunk_bytes if cursor is not None else None
+        if speech and not self.onHook:
+            log.info("Barge-in after {} chunks. Stopping prompt '{}'.".format(scanned, filename))
+            self.audioChannel.stop()
+            self._finish_playback(False)
+            return True, scanned_until
+        return False, scanned_until
+
+    def _do_play_and_listen_task(self, filename, on_speech_cb, on_silence_cb, listen_duration, silence_threshold, barge_in=False, barge_in_threshold=None):
         """Background task combining the steps."""
         try:
-            if not self.play_file(filename):
+            handle = self.play_file(filename)
+            if not handle:
                 raise RuntimeError("Playback failed to start for {}".format(filename))
-            playback_completed = self._wait_for_playback_or_hangup(filename)
+            analysis_result = None
+            scanned_until = None
+            if barge_in:
+                barged_in, scanned_until = self._listen_during_playback(handle, barge_in_threshold or silence_threshold)
+                if barged_in:
+                    analysis_result = "speech"
+            else:
+                playback_completed = self._wait_for_playback_or_hangup(handle)
+                if not playback_completed and not self.onHook:
+                     log.warning("Playback didn't complete normally (e.g., short file?). Continuing to record.")
             if self.onHook:
                 log.info("Hung up during playback wait. Cancelling listen.")
                 return
-            if not playback_completed:
-                 log.warning("Playback didn't complete normally (e.g., short file?). Continuing to record.")
-            analysis_result = "error"
-            if not self.onHook:
-                analysis_result = self._record_and_analyze(listen_duration, silence_threshold)
-            else:
-                 log.info("Hung up right after playback, before recording could start.")
+            if analysis_result is None:
+                analysis_result = self._record_and_analyze(listen_duration, silence_threshold, preroll=self.preroll_seconds,
+                                                           scanned_until=scanned_until)
             if not self.onHook:
                 if analysis_result == "speech":
                     log.info("Speech detected.")
@@ -324,14 +599,20 @@ class Handset:
             log.debug("Play and listen task finished.")
 
     # ... ( play_and_listen method remains the same ) ...
-    def play_and_listen(self, filename, on_speech_detected_cb, on_silence_detected_cb, listen_duration=3, silence_threshold=500):
-        """ Plays audio, then listens for speech. Calls callbacks in background thread. """
+    def play_and_listen(self, filename, on_speech_detected_cb, on_silence_detected_cb, listen_duration=3, silence_threshold=500, barge_in=False, barge_in_threshold=None):
+        """
+        Plays audio, then listens for speech. Calls callbacks in background thread.
+
+        With barge_in=True the mic is also scanned while the prompt plays; sustained speech
+        stops the prompt and fires on_speech_detected_cb straight away. barge_in_threshold
+        defaults to silence_threshold and can be raised if the earpiece bleeds into the mic.
+        """
         if not self.audioChannel: log.error("Audio channel not available. Cannot play and listen."); return
         if not self.pool: log.error("Thread pool not available. Cannot play and listen."); return
         if self.onHook: log.warning("Phone is on hook. Cannot play and listen."); return
         if not self._listen_lock.acquire(blocking=False): log.warning("Another play_and_listen process is already running. Ignoring new request."); return
-        log.info("Initiating play_and_listen: Play '{}', Listen {}s (Threshold: {})".format(filename, listen_duration, silence_threshold))
-        self._submit_task(self._do_play_and_listen_task, filename, on_speech_detected_cb, on_silence_detected_cb, listen_duration, silence_threshold)
+        log.info("Initiating play_and_listen: Play '{}', Listen {}s (Threshold: {}, Barge-in: {})".format(filename, listen_duration, silence_threshold, barge_in))
+        self._submit_task(self._do_play_and_listen_task, filename, on_speech_detected_cb, on_silence_detected_cb, listen_duration, silence_threshold, barge_in, barge_in_threshold)
 
     # ... ( on_hook method remains the same ) ...
     def on_hook(self):
@@ -340,6 +621,7 @@ class Handset:
              log.info("Phone HUNG UP")
              self.onHook = True
              if self.audioChannel: self.audioChannel.stop() # This will stop loops too
+             self._finish_playback(False)
 
     # ... ( off_hook method remains the same ) ...
     def off_hook(self):
@@ -352,6 +634,7 @@ class Handset:
     def stop(self):
         """General stop method - primarily stops audio."""
         log.debug("Handset stop called.")
+        self._stop_recording.set()
         if self.audioChannel: self.audioChannel.stop()
         self.cleanup()
 
@@ -372,6 +655,20 @@ class Handset:
             log.debug("Shutting down thread pool...")
             self.pool.shutdown(wait=True)
             log.debug("Thread pool shut down.")
+        if self._pump_thread and self._pump_thread.is_alive():
+            log.debug("Stopping event pump thread...")
+            self._pump_running = False
+            try: pygame.event.post(pygame.event.Event(PUMP_STOP_EVENT))
+            except pygame.error as e: log.warning("Could not wake event pump: {}".format(e))
+            self._pump_thread.join(timeout=1)
+        self._finish_playback(False)
+        if self._capture_thread:
+            self._capture_thread.join(timeout=5)
+        if self.capture:
+            log.debug("Audio capture stats: {}".format(self.capture.stats()))
+            self.capture.stop()
+        log.debug("Sound cache stats: {}".format(self.sound_cache.stats()))
+        self.sound_cache.clear()
         log.debug("Quitting pygame mixer...")
         mixer.quit()
         log.debug("Quitting pygame display...")
@@ -479,12 +776,7 @@ if __name__ == "__main__":
             elif choice == 'q': print("Quitting..."); break
             else: print("Invalid choice.")
 
-            # Event pump in main loop is still good practice
-            try:
-                 pygame.event.pump()
-            except pygame.error as e:
-                 # This might still fail if dummy driver setup wasn't perfect, but log it
-                 log.warning("pygame.event.pump() failed in main loop: {}".format(e))
+            # Events are pumped by the Handset's own thread; don't drain the queue here.
             time.sleep(0.1)
 
     except KeyboardInterrupt:
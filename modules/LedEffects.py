@@ -0,0 +1,92 @@
+import numpy as np
+
+NUM_LEDS = 160 # Matches NUM_LEDS in arduino/fire/fire.ino
+
+
+def scale8_video(values, scale):
+    """FastLED scale8_video: scales 0-255 values, keeping any non-zero input non-zero."""
+    values = values.astype(np.uint16)
+    return ((values * scale) >> 8) + ((values != 0) & (scale != 0))
+
+
+def heat_color(heat):
+    """
+    Vectorised FastLED HeatColor: maps heat (uint8 array) to an (n, 4) RGBW array
+    running black -> red -> yellow -> white, with the white channel left at 0.
+    """
+    t192 = scale8_video(heat, 191)
+    ramp = ((t192 & 0x3F) << 2).astype(np.uint8)
+    hottest = (t192 & 0x80) != 0
+    middle = ((t192 & 0x40) != 0) & ~hottest
+    coolest = ~(hottest | middle)
+
+    colors = np.zeros((len(heat), 4), dtype=np.uint8)
+    colors[hottest, 0] = 255
+    colors[hottest, 1] = 255
+    colors[hottest, 2] = ramp[hottest]
+    colors[middle, 0] = 255
+    colors[middle, 1] = ramp[middle]
+    colors[coolest, 0] = ramp[coolest]
+    return colors
+
+
+class Fire2012:
+    """
+    Host-side port of the Fire2012 effect from arduino/fire/fire.ino, vectorised with NumPy.
+
+    Attributes:
+        num_leds (int): Strip length.
+        cooling (int): How much the air cools as it rises (FastLED suggests 20-100).
+        sparking (int): Chance (out of 255) of a new spark each frame.
+        reverse (bool): Flip the flame so it burns from the far end.
+    """
+
+    def __init__(self, num_leds=NUM_LEDS, cooling=55, sparking=120, reverse=False, seed=None):
+        """
+        Args:
+            num_leds (int): Strip length. Defaults to NUM_LEDS.
+            cooling (int): Defaults to 55, as in the sketch.
+            sparking (int): Defaults to 120, as in the sketch.
+            reverse (bool): Defaults to False.
+            seed (int): Optional random seed, for repeatable frames.
+        """
+        self.num_leds = num_leds
+        self.cooling = cooling
+        self.sparking = sparking
+        self.reverse = reverse
+        self._random = np.random.RandomState(seed)
+        self._heat = np.zeros(num_leds, dtype=np.int16)
+
+    def render(self):
+        """Advances the simulation one frame and returns an (num_leds, 4) uint8 RGBW array."""
+        heat = self._heat
+        n = self.num_leds
+
+        # Step 1. Cool down every cell a little
+        cool_max = ((self.cooling * 10) // n) + 2
+        heat -= self._random.randint(0, cool_max, size=n).astype(np.int16)
+        np.clip(heat, 0, 255, out=heat)
+
+        # Step 2. Heat from each cell drifts 'up' and diffuses a little.
+        # The sketch walks downwards, so every cell reads its neighbours' previous values.
+        if n > 2:
+            heat[2:] = (heat[1:-1] + 2 * heat[:-2]) // 3
+
+        # Step 3. Randomly ignite new 'sparks' of heat near the bottom
+        if self._random.randint(0, 256) < self.sparking:
+            y = self._random.randint(0, min(7, n))
+            heat[y] = min(255, heat[y] + self._random.randint(160, 255))
+
+        # Step 4. Map from heat cells to LED colors
+        colors = heat_color(heat.astype(np.uint8))
+        return colors[::-1] if self.reverse else colors
+
+
+class Solid:
+    """A single RGBW color, for fills and blackouts."""
+
+    def __init__(self, color=(0, 0, 0, 0), num_leds=NUM_LEDS):
+        self._frame = np.tile(np.array(color, dtype=np.uint8), (num_leds, 1))
+
+    def render(self):
+        return self._frame
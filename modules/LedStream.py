@@ -0,0 +1,262 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from modules.Serial import FRAME_ACK, FRAME_ERROR
+
+log = logging.getLogger("LEDSTREAM")
+
+# Binary frame protocol (see arduino/fire/fire.ino):
+#   SYNC, type, length (2 bytes, little endian), payload, checksum (sum of payload bytes & 0xFF)
+# Pixels are 4 bytes in the strip's wire order G, R, B, W so the sketch can copy them straight into leds[].
+# The sketch replies FRAME_ACK (a line) after showing each frame; the streamer waits for it before
+# sending the next, since the strip update blocks serial interrupts and would otherwise drop bytes.
+SYNC = 0xA5
+FRAME_KEY = 0x01    # Every pixel
+FRAME_DELTA = 0x02  # Changed spans: start (2 bytes), count (1 byte), count pixels
+FRAME_RLE = 0x03    # Runs over the whole strip: count (1 byte), one pixel
+FRAME_OVERHEAD = 5
+MAX_RUN = 255
+
+FPS = 30
+KEYFRAME_INTERVAL = 30 # Frames between full frames, so a corrupted frame can't linger
+BITS_PER_BYTE = 10 # 8N1: start + 8 data + stop
+
+FRAME_TYPE_NAMES = {FRAME_KEY: 'key', FRAME_DELTA: 'delta', FRAME_RLE: 'rle'}
+
+
+def to_wire(frame):
+    """Returns a C-contiguous (n, 4) uint8 array in G, R, B, W order from an RGBW frame."""
+    return np.ascontiguousarray(frame[:, [1, 0, 2, 3]], dtype=np.uint8)
+
+
+def _packet(frame_type, payload):
+    payload = bytes(payload)
+    return bytes((SYNC, frame_type, len(payload) & 0xFF, len(payload) >> 8)) + payload + \
+        bytes((sum(payload) & 0xFF,))
+
+
+def _runs(mask):
+    """Returns (starts, ends) of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def encode_key(wire):
+    return _packet(FRAME_KEY, wire.tobytes())
+
+
+def encode_delta(previous, wire):
+    """Encodes the spans of wire that differ from previous. Returns b"" if nothing changed."""
+    changed = np.any(previous != wire, axis=1)
+    if not changed.any():
+        return b""
+    payload = bytearray()
+    for start, end in zip(*_runs(changed)):
+        for chunk in range(start, end, MAX_RUN):
+            count = min(MAX_RUN, end - chunk)
+            payload += bytes((chunk & 0xFF, chunk >> 8, count))
+            payload += wire[chunk:chunk + count].tobytes()
+    return _packet(FRAME_DELTA, payload)
+
+
+def encode_rle(wire):
+    packed = wire.view(np.uint32).ravel()
+    boundaries = np.flatnonzero(packed[1:] != packed[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(packed)]))
+    payload = bytearray()
+    for start, end in zip(starts, ends):
+        pixel = wire[start].tobytes()
+        for chunk in range(start, end, MAX_RUN):
+            payload.append(min(MAX_RUN, end - chunk))
+            payload += pixel
+    return _packet(FRAME_RLE, payload)
+
+
+def encode_frame(previous, wire, keyframe=False):
+    """
+    Returns the smallest packet that turns previous into wire (both wire-order arrays).
+
+    Args:
+        previous: What the strip shows now, or None if unknown.
+        wire: Next frame from to_wire().
+        keyframe (bool): Don't use a delta, so the strip is fully rewritten.
+
+    Returns:
+        bytes: The packet, or b"" if the frame is unchanged.
+    """
+    candidates = [encode_rle(wire)]
+    if previous is None or keyframe:
+        candidates.append(encode_key(wire))
+    else:
+        delta = encode_delta(previous, wire)
+        if not delta:
+            return b""
+        candidates.append(delta)
+    return min(candidates, key=len)
+
+
+def frame_budget(baud_rate, fps=FPS):
+    """Bytes per frame the link can carry at fps."""
+    return baud_rate / BITS_PER_BYTE / fps
+
+
+def check_bandwidth(effect, baud_rate, fps=FPS, frames=300):
+    """
+    Renders and encodes frames offline and compares their size with the link budget.
+
+    Returns:
+        dict: budget, mean/p99/max bytes per frame (keyframes included), and whether the
+              worst frame fits ('ok'), i.e. whether fps can be sustained at baud_rate.
+    """
+    previous = None
+    sizes = []
+    for i in range(frames):
+        wire = to_wire(effect.render())
+        sizes.append(len(encode_frame(previous, wire, keyframe=(i % KEYFRAME_INTERVAL == 0))))
+        previous = wire
+    sizes.sort()
+    budget = frame_budget(baud_rate, fps)
+    return {
+        'baud_rate': baud_rate,
+        'fps': fps,
+        'budget_bytes': budget,
+        'mean_bytes': sum(sizes) / len(sizes),
+        'p99_bytes': sizes[min(len(sizes) - 1, int(len(sizes) * 0.99))],
+        'max_bytes': sizes[-1],
+        'ok': sizes[-1] <= budget,
+    }
+
+
+class LedStreamer:
+    """
+    Renders an effect on the host and streams it to the fire sketch at a fixed rate.
+
+    Each frame is sent as the smallest of a delta, RLE or key frame, and the next
+    frame waits for the sketch's acknowledgement. If an ack is missed the strip's
+    state is unknown, so the next frame is a full one.
+
+    Attributes:
+        serial: A modules.Serial.Serial connected to the sketch.
+        effect: Anything with render() returning an (n, 4) RGBW uint8 array.
+        fps (int): Target frame rate.
+    """
+
+    def __init__(self, serial, effect, fps=FPS):
+        """
+        Args:
+            serial: Connected modules.Serial.Serial.
+            effect: Effect to render (e.g. modules.LedEffects.Fire2012()).
+            fps (int): Target frame rate. Defaults to FPS.
+        """
+        self.serial = serial
+        self.effect = effect
+        self.fps = fps
+        self._ack = threading.Event()
+        self._frame_ok = False
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._previous = None
+        serial.subscribe(self._on_line, prefix=FRAME_ACK)
+        serial.subscribe(self._on_line, prefix=FRAME_ERROR)
+
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.bytes_sent = 0
+        self.ack_timeouts = 0
+        self.frame_errors = 0
+        self.late_frames = 0
+        self.frame_types = {name: 0 for name in FRAME_TYPE_NAMES.values()}
+        self.render_time_total = 0.0
+
+    def _on_line(self, line):
+        if line == FRAME_ACK or line == FRAME_ERROR:
+            self._frame_ok = line == FRAME_ACK
+            self._ack.set()
+
+    def set_effect(self, effect):
+        """Switches effect at the next frame."""
+        self.effect = effect
+
+    def start(self):
+        """Checks the bandwidth budget and starts the streaming thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # Rendering ahead advances the effect a couple of seconds, which doesn't matter for a live look.
+        budget = check_bandwidth(self.effect, self.serial.baud_rate, self.fps, frames=2 * self.fps)
+        if not budget['ok']:
+            log.warning("{} baud carries {:.0f} bytes per frame at {} fps but frames reach {} bytes; "
+                        "expect a lower frame rate".format(self.serial.baud_rate, budget['budget_bytes'],
+                                                           self.fps, budget['max_bytes']))
+        self._stop_event.clear()
+        self._previous = None
+        self._thread = threading.Thread(target=self._run, name="led-stream")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops streaming. The sketch keeps showing the last frame until L1/L0."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        next_frame = time.monotonic()
+        ack_timeout = 2 * interval
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            wire = to_wire(self.effect.render())
+            self.render_time_total += time.monotonic() - start
+
+            keyframe = self.frames_sent % KEYFRAME_INTERVAL == 0
+            packet = encode_frame(self._previous, wire, keyframe=keyframe)
+            if packet:
+                self._ack.clear()
+                try:
+                    self.serial.send_bytes(packet)
+                except Exception as e:
+                    log.debug("LED frame not sent: {}".format(e))
+                    self._previous = None
+                else:
+                    self.frames_sent += 1
+                    self.bytes_sent += len(packet)
+                    self.frame_types[FRAME_TYPE_NAMES[packet[1]]] += 1
+                    if not self._ack.wait(ack_timeout):
+                        self.ack_timeouts += 1
+                        self._previous = None
+                    elif not self._frame_ok:
+                        self.frame_errors += 1
+                        self._previous = None
+                    else:
+                        self._previous = wire
+            else:
+                self.frames_skipped += 1
+
+            next_frame += interval
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                self.late_frames += 1
+                next_frame = time.monotonic() # Don't try to catch up with a burst
+
+    def stats(self):
+        """Returns frame counts, bytes and link utilisation."""
+        frames = self.frames_sent
+        return {
+            'frames_sent': frames,
+            'frames_skipped': self.frames_skipped,
+            'frame_types': dict(self.frame_types),
+            'mean_frame_bytes': self.bytes_sent / frames if frames else 0.0,
+            'budget_bytes': frame_budget(self.serial.baud_rate, self.fps),
+            'ack_timeouts': self.ack_timeouts,
+            'frame_errors': self.frame_errors,
+            'late_frames': self.late_frames,
+            'mean_render_ms': self.render_time_total / (frames + self.frames_skipped) * 1000
+            if frames + self.frames_skipped else 0.0,
+        }
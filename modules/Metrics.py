@@ -0,0 +1,332 @@
+"""
+Counters, gauges and fixed-bucket histograms for the running prop.
+
+    from modules import Metrics
+
+    PICKUPS = Metrics.counter("phone_pickups_total", "Handset lifted")
+    LISTENS = Metrics.counter("phone_listen_results_total", "Listen outcomes", labels=("result",))
+    PICKUPS.inc()
+    LISTENS.labels("speech").inc()
+
+Metrics are declared once at module level and registered in REGISTRY. Updates take one
+uncontended lock (a histogram also does a bisect), so they are safe on the audio
+and GPIO callback threads. Gauges can take a function instead, which is only
+called when the metrics are read.
+
+REGISTRY.snapshot() returns a dict (sent over OSC as JSON). render_prometheus() returns
+the Prometheus text format that MetricsServer serves on localhost.
+"""
+import bisect
+import json
+import logging
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+log = logging.getLogger("METRICS")
+
+METRICS_HOST = "127.0.0.1" # Local only; scrape over ssh or a local agent
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9105))
+
+# Seconds. Covers callback-path work (sub-ms) up to a listen window.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value != value:
+        return "NaN"
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs) + "}"
+
+
+class _Metric:
+    """Base for a metric, or one labelled child of it."""
+
+    kind = None
+
+    def __init__(self, name, help="", labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._children = {} if self.label_names else None
+
+    def labels(self, *values):
+        """Returns the child for these label values, creating it on first use."""
+        if self._children is None or len(values) != len(self.label_names):
+            raise ValueError("{} takes labels {}".format(self.name, self.label_names))
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    def _new_child(self):
+        return type(self)(self.name, self.help)
+
+    def _series(self):
+        """Yields (label values, child) pairs to read."""
+        if self._children is None:
+            yield (), self
+        else:
+            for values, child in list(self._children.items()):
+                yield values, child
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def __init__(self, name, help="", labels=()):
+        super().__init__(name, help, labels)
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def _sample(self):
+        return self.value
+
+    def _render(self, label_names, values):
+        return ["{}{} {}".format(self.name, _format_labels(label_names, values), _format_value(self.value))]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, or is read from a function when collected."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help="", labels=()):
+        super().__init__(name, help, labels)
+        self.value = 0
+        self._function = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, fn):
+        """Reads the gauge from fn() at collection time instead of storing a value."""
+        self._function = fn
+
+    def get(self):
+        if self._function is not None:
+            try:
+                return self._function()
+            except Exception as e:
+                log.debug("Gauge {} could not be read: {}".format(self.name, e))
+                return float('nan')
+        return self.value
+
+    def _sample(self):
+        return self.get()
+
+    def _render(self, label_names, values):
+        return ["{}{} {}".format(self.name, _format_labels(label_names, values), _format_value(self.get()))]
+
+
+class Histogram(_Metric):
+    """
+    Counts observations into fixed buckets (upper bounds, in seconds for latencies)
+    and keeps their sum, so rates and quantiles can be estimated by the scraper.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help="", labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1) # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def _new_child(self):
+        return Histogram(self.name, self.help, buckets=self.buckets)
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def _cumulative(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self.sum, self.count
+        cumulative = []
+        running = 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            running += n
+            cumulative.append((bound, running))
+        return cumulative, count, total
+
+    def _sample(self):
+        cumulative, count, total = self._cumulative()
+        return {
+            'count': count,
+            'sum': total,
+            'buckets': [[_format_value(bound), n] for bound, n in cumulative], # Cumulative, as in Prometheus
+        }
+
+    def _render(self, label_names, values):
+        cumulative, count, total = self._cumulative()
+        lines = ["{}_bucket{} {}".format(self.name, _format_labels(label_names, values, ("le", _format_value(bound))), n)
+                 for bound, n in cumulative]
+        labels = _format_labels(label_names, values)
+        lines.append("{}_sum{} {}".format(self.name, labels, _format_value(total)))
+        lines.append("{}_count{} {}".format(self.name, labels, count))
+        return lines
+
+
+class Registry:
+    """Holds metrics by name. Registering an existing name returns the existing metric."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                    raise ValueError("Metric {} already registered as a different type".format(metric.name))
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def snapshot(self, prefix=""):
+        """
+        Returns {name: value} for metrics starting with prefix. Labelled metrics map
+        'label=value,...' to each child's value; histograms give count, sum and buckets.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        result = {}
+        for name, metric in metrics:
+            if not name.startswith(prefix):
+                continue
+            if metric.label_names:
+                result[name] = {",".join("{}={}".format(k, v) for k, v in zip(metric.label_names, values)): child._sample()
+                                for values, child in metric._series()}
+            else:
+                result[name] = metric._sample()
+        return result
+
+    def render_prometheus(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for name, metric in metrics:
+            if metric.help:
+                lines.append("# HELP {} {}".format(name, metric.help))
+            lines.append("# TYPE {} {}".format(name, metric.kind))
+            for values, child in metric._series():
+                lines.extend(child._render(metric.label_names, values))
+        return "\n".join(lines) + "\n"
+
+    def to_json(self, prefix=""):
+        return json.dumps(self.snapshot(prefix), sort_keys=True)
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help="", labels=()):
+    return REGISTRY.register(Counter(name, help, labels))
+
+
+def gauge(name, help="", labels=()):
+    return REGISTRY.register(Gauge(name, help, labels))
+
+
+def histogram(name, help="", labels=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("HTTP " + format % args)
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer is 3.7+; the Pi runs 3.5.
+    daemon_threads = True
+
+
+class MetricsServer:
+    """
+    Serves the registry as Prometheus text at http://host:port/metrics.
+
+    Attributes:
+        host (str): Address to bind. Defaults to localhost only.
+        port (int): Port to bind.
+    """
+
+    def __init__(self, registry=REGISTRY, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Starts serving on a background thread. Returns False if the port couldn't be bound."""
+        try:
+            self._server = _ThreadingHTTPServer((self.host, self.port), _Handler)
+        except OSError as e:
+            log.error("Could not start metrics endpoint on {}:{}: {}".format(self.host, self.port, e))
+            return False
+        self._server.registry = self.registry
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http")
+        self._thread.daemon = True
+        self._thread.start()
+        log.info("Metrics at http://{}:{}/metrics".format(self.host, self.port))
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -1,12 +1,27 @@
 import threading
 import time
 import logging
+import asyncio
 from pythonosc import dispatcher
 from pythonosc import osc_server
 from pythonosc import udp_client
 
+from modules.HandlerExecutor import HandlerExecutor, INLINE
+from modules.OSCDispatch import FastDispatcher
+from modules.OSCSender import OSCSender, build_message
+from modules import Trace
+from modules import Metrics
+
 log = logging.getLogger("OSC")
 
+BACKENDS = ("threading", "asyncio")
+
+SENT = Metrics.counter("phone_osc_sent_total", "Messages sent (or queued with queued_send)")
+SEND_ERRORS = Metrics.counter("phone_osc_send_errors_total", "Messages that could not be sent")
+
+# asyncio.all_tasks is 3.7+; Task.all_tasks covers the Pi's Python 3.5.
+_all_tasks = getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks
+
 class OSCHandler:
     """
     A class to handle OSC communication, allowing subscription to addresses
@@ -17,9 +32,14 @@ class OSCHandler:
         listen_port (int): The port the server listens on.
         send_ip (str): The default IP address to send messages TO. Must be a specific unicast address.
         send_port (int): The default port to send messages TO.
+        backend (str): "threading" (a thread per datagram) or "asyncio" (one event loop thread,
+                       handlers run in arrival order, coroutine callbacks allowed).
+        fast_dispatch (bool): Whether incoming packets use the pre-compiled FastDispatcher.
     """
 
-    def __init__(self, listen_ip="0.0.0.0", listen_port=7000, send_ip="127.0.0.1", send_port=8000):
+    def __init__(self, listen_ip="0.0.0.0", listen_port=7000, send_ip="127.0.0.1", send_port=8000, backend="threading",
+                 handler_workers=2, handler_queue_size=32, queued_send=False, dedup_addresses=(),
+                 fast_dispatch=False):
         """
         Initializes the OSCHandler.
 
@@ -28,22 +48,47 @@ class OSCHandler:
             listen_port (int): Port for the server to listen ON. Defaults to 7000.
             send_ip (str): Specific IP address for the client to send TO. Defaults to "127.0.0.1" (localhost).
             send_port (int): Port for the client to send TO. Defaults to 8000.
+            backend (str): "threading" or "asyncio". Defaults to "threading".
+            handler_workers (int): Worker threads for non-inline subscriptions. Defaults to 2.
+            handler_queue_size (int): Maximum queued handler calls before dropping. Defaults to 32.
+            queued_send (bool): Hand send() to a background sender thread that batches messages
+                                into bundles instead of writing on the caller's thread. Defaults to False.
+            dedup_addresses (iterable): With queued_send, addresses whose consecutive identical
+                                        messages are suppressed. Listed addresses form one state
+                                        stream (e.g. pickup and hangup). Defaults to none.
+            fast_dispatch (bool): Parse packets in place and look subscribed addresses up in a dict
+                                  (regex matching only for wildcards) instead of using python-osc's
+                                  Dispatcher. Bundle timetags are not waited on. Defaults to False.
         """
+        if backend not in BACKENDS:
+            raise ValueError("backend must be one of {}".format(BACKENDS))
         self.listen_ip = listen_ip
         self.listen_port = listen_port
         self.send_ip = send_ip
         self.send_port = send_port
+        self.backend = backend
+        self.fast_dispatch = fast_dispatch
 
-        self._dispatcher = dispatcher.Dispatcher()
-        self._server = osc_server.ThreadingOSCUDPServer(
-            (self.listen_ip, self.listen_port), self._dispatcher
-        )
+        self._dispatcher = FastDispatcher() if fast_dispatch else dispatcher.Dispatcher()
+        self._executor = HandlerExecutor(workers=handler_workers, queue_size=handler_queue_size)
+        self._server = None
         self._server_thread = None
+        self._loop = None
+        self._transport = None
+        if backend == "threading":
+            self._server = osc_server.ThreadingOSCUDPServer(
+                (self.listen_ip, self.listen_port), self._dispatcher
+            )
 
         self._client = udp_client.SimpleUDPClient(self.send_ip, self.send_port)
+        self._sender = None
+        if queued_send:
+            self._sender = OSCSender(self._transmit)
+            for address in dedup_addresses:
+                self._sender.dedup(address, group="default")
         log.info("OSC Client configured to send TO {}:{}".format(self.send_ip, self.send_port))
 
-    def subscribe(self, address, callback):
+    def subscribe(self, address, callback, policy=INLINE):
         """
         Subscribes a callback function to a specific OSC address.
 
@@ -51,27 +96,120 @@ class OSCHandler:
             address (str): The OSC address pattern (e.g., '/filter').
             callback (function): The function to call when a message arrives.
                                  Must accept address (str) and message arguments (*args).
+                                 May be a coroutine function with the asyncio backend.
+            policy (str): How the callback is run (see modules.HandlerExecutor):
+                          "inline" in the receiving thread (default), "pool" on the shared
+                          bounded worker pool, "drop_if_busy" to ignore messages while the
+                          previous one is still being handled, or "latest" to keep only the
+                          newest message while busy.
         """
-        self._dispatcher.map(address, callback)
-        log.debug("Subscribed callback for address: {}".format(address))
+        if asyncio.iscoroutinefunction(callback):
+            if self.backend != "asyncio":
+                raise ValueError("Coroutine callbacks need backend='asyncio'")
+            if policy != INLINE:
+                raise ValueError("Coroutine callbacks only support the inline policy")
+            callback = self._schedule_coroutine(callback)
+        self._dispatcher.map(address, self._executor.wrap(address, callback, policy))
+        log.debug("Subscribed callback for address: {} (policy: {})".format(address, policy))
+
+    def handler_stats(self):
+        """Returns handler queue depth, drop counts and runtimes per address."""
+        stats = self._executor.stats()
+        if self.fast_dispatch:
+            stats['dispatch'] = self._dispatcher.stats()
+        return stats
 
     def send(self, address, *args):
         """
         Sends an OSC message to the configured target address and port.
+        With queued_send the message is queued and this returns immediately.
 
         Args:
             address (str): The OSC address pattern to send to (e.g., '/control/volume').
             *args: The data arguments to send (int, float, str, bool, etc.).
         """
         try:
-            self._client.send_message(address, args)
+            with Trace.span("osc.send", "osc", address=address):
+                if self._sender is not None:
+                    self._sender.send(address, args)
+                else:
+                    self._transmit(build_message(address, args))
+            SENT.inc()
         except Exception as e:
+            SEND_ERRORS.inc()
             log.error("Error sending OSC message to {} at target {}:{}: {}".format(
                 address, self.send_ip, self.send_port, e))
 
+    def send_at(self, when, address, *args):
+        """
+        Schedules an OSC message for wall-clock time `when` (time.time() seconds).
+        It is sent in a bundle carrying that timetag. Requires queued_send.
+        """
+        if self._sender is None:
+            raise RuntimeError("send_at needs OSCHandler(queued_send=True)")
+        self._sender.send(address, args, at=when)
+
+    def send_stats(self):
+        """Returns outbound queue depth, counters and send latency, or None without queued_send."""
+        return self._sender.stats() if self._sender is not None else None
+
+    def _transmit(self, content):
+        """Writes an OscMessage or OscBundle to the target."""
+        transport, loop = self._transport, self._loop
+        if transport is not None:
+            # Reuse the server's socket and hand the write to the event loop thread.
+            # stop_server() may close the loop under us; the send is dropped then.
+            try:
+                if loop.is_closed():
+                    raise RuntimeError("Event loop is closed")
+                loop.call_soon_threadsafe(transport.sendto, content.dgram, (self.send_ip, self.send_port))
+            except RuntimeError as e:
+                log.debug("Dropped OSC send during shutdown: {}".format(e))
+        else:
+            self._client.send(content)
+
+    def _schedule_coroutine(self, coroutine_function):
+        """Wraps a coroutine callback so the dispatcher starts it as a task on the event loop."""
+        def handler(address, *args):
+            asyncio.ensure_future(coroutine_function(address, *args), loop=self._loop)
+        handler.__name__ = getattr(coroutine_function, '__name__', 'coroutine_handler')
+        return handler
+
+    def _run_event_loop(self, ready):
+        """Event loop thread for the asyncio backend. Datagrams are dispatched here, one at a time, in order."""
+        asyncio.set_event_loop(self._loop)
+        try:
+            server = osc_server.AsyncIOOSCUDPServer((self.listen_ip, self.listen_port), self._dispatcher, self._loop)
+            self._transport, _ = self._loop.run_until_complete(server.create_serve_endpoint())
+        except Exception as e:
+            log.error("Could not start asyncio OSC server: {}".format(e))
+            ready.set()
+            return
+        ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            transport, self._transport = self._transport, None
+            transport.close()
+            pending = [t for t in _all_tasks(self._loop) if not t.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.close()
+
     def start_server(self):
         """Starts the OSC server in a separate background thread."""
         if self._server_thread is None or not self._server_thread.is_alive():
+            if self.backend == "asyncio":
+                self._loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                self._server_thread = threading.Thread(target=self._run_event_loop, args=(ready,))
+                self._server_thread.daemon = True
+                self._server_thread.start()
+                ready.wait(timeout=2)
+                log.debug("OSC asyncio server started on {}:{}".format(self.listen_ip, self.listen_port))
+                return
             self._server_thread = threading.Thread(target=self._server.serve_forever)
             self._server_thread.daemon = True
             self._server_thread.start()
@@ -83,6 +221,20 @@ class OSCHandler:
 
     def stop_server(self):
         """Stops the OSC server gracefully."""
+        self._executor.stop()
+        if self._sender is not None:
+            self._sender.stop()
+        if self.backend == "asyncio":
+            if self._server_thread and self._server_thread.is_alive():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._server_thread.join(timeout=2)
+                if self._server_thread.is_alive():
+                    print("Warning: Event loop thread did not shut down cleanly.")
+                self._server_thread = None
+                log.debug("OSC Server stopped.")
+            else:
+                print("OSC Server is not running or already stopped.")
+            return
         if self._server and self._server_thread and self._server_thread.is_alive():
             print("Attempting to shut down OSC server...")
             self._server.shutdown()
@@ -0,0 +1,268 @@
+import logging
+import re
+import struct
+
+from modules import Trace
+
+log = logging.getLogger("OSCDISPATCH")
+
+WILDCARD_CHARS = "*?[]{}"
+CACHE_SIZE = 1024 # Resolved addresses remembered; bounded so stray addresses can't grow it forever
+
+BUNDLE_PREFIX = b"#bundle\x00"
+
+_INT = struct.Struct(">i")
+_FLOAT = struct.Struct(">f")
+_DOUBLE = struct.Struct(">d")
+_INT64 = struct.Struct(">q")
+_UINT32 = struct.Struct(">I")
+_UINT64 = struct.Struct(">Q")
+
+_FIXED_TYPES = {
+    'i': _INT,
+    'f': _FLOAT,
+    'd': _DOUBLE,
+    'h': _INT64,
+    'r': _UINT32,
+    't': _UINT64,
+}
+_CONSTANT_TYPES = {
+    'T': True,
+    'F': False,
+    'N': None,
+    'I': float("inf"),
+}
+
+
+class ParseError(ValueError):
+    """Raised for datagrams that aren't well-formed OSC."""
+
+
+def _read_string(data, offset):
+    """Returns (str, next_offset) for the null-terminated, 4-byte padded string at offset."""
+    end = data.find(b"\x00", offset)
+    if end < 0:
+        raise ParseError("Unterminated string at {}".format(offset))
+    value = data[offset:end].decode("utf-8")
+    return value, (end + 4) & ~3
+
+
+def parse_message(data, offset=0, end=None):
+    """
+    Parses one OSC message from data[offset:end] with struct.unpack_from, without slicing the buffer.
+
+    Returns:
+        tuple: (address, args)
+
+    Raises:
+        ParseError: If the message is malformed or uses an unsupported type tag.
+    """
+    if end is None:
+        end = len(data)
+    try:
+        address, offset = _read_string(data, offset)
+        if offset >= end:
+            return address, ()
+        tags, offset = _read_string(data, offset)
+        if not tags.startswith(","):
+            raise ParseError("Missing type tag string for {}".format(address))
+        args = []
+        stack = []
+        for tag in tags[1:]:
+            fixed = _FIXED_TYPES.get(tag)
+            if fixed is not None:
+                args.append(fixed.unpack_from(data, offset)[0])
+                offset += fixed.size
+            elif tag in _CONSTANT_TYPES:
+                args.append(_CONSTANT_TYPES[tag])
+            elif tag == 's' or tag == 'S':
+                value, offset = _read_string(data, offset)
+                args.append(value)
+            elif tag == 'b':
+                size = _INT.unpack_from(data, offset)[0]
+                offset += 4
+                args.append(bytes(data[offset:offset + size]))
+                offset += (size + 3) & ~3
+            elif tag == 'c':
+                args.append(chr(_UINT32.unpack_from(data, offset)[0]))
+                offset += 4
+            elif tag == 'm':
+                args.append(tuple(data[offset:offset + 4]))
+                offset += 4
+            elif tag == '[':
+                stack.append(args)
+                args = []
+            elif tag == ']':
+                if not stack:
+                    raise ParseError("Unbalanced array in {}".format(address))
+                inner, args = args, stack.pop()
+                args.append(inner)
+            else:
+                raise ParseError("Unsupported type tag '{}' in {}".format(tag, address))
+        if stack or offset > end:
+            raise ParseError("Truncated message for {}".format(address))
+        return address, tuple(args)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ParseError(str(e))
+
+
+def parse_packet(data, offset=0, end=None, timetag=0):
+    """
+    Yields (timetag, address, args) for every message in an OSC message or (nested) bundle.
+    timetag is the raw 64-bit NTP value of the enclosing bundle, 0 for a bare message
+    (1 means "immediately" in the OSC spec).
+
+    Raises:
+        ParseError: If the packet is malformed.
+    """
+    if end is None:
+        end = len(data)
+    if data.startswith(BUNDLE_PREFIX, offset):
+        try:
+            timetag = _UINT64.unpack_from(data, offset + 8)[0]
+            offset += 16
+            while offset < end:
+                size = _INT.unpack_from(data, offset)[0]
+                offset += 4
+                if size <= 0 or offset + size > end:
+                    raise ParseError("Bad bundle element size {}".format(size))
+                for item in parse_packet(data, offset, offset + size, timetag):
+                    yield item
+                offset += size
+        except struct.error as e:
+            raise ParseError(str(e))
+    elif data.startswith(b"/", offset):
+        address, args = parse_message(data, offset, end)
+        yield timetag, address, args
+    else:
+        raise ParseError("Not an OSC message or bundle")
+
+
+def compile_pattern(pattern):
+    """Converts an OSC address pattern (*, ?, [..], {a,b}) into a compiled regex."""
+    regex = "^"
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "*":
+            regex += "[^/]*"
+        elif c == "?":
+            regex += "[^/]"
+        elif c == "[":
+            regex += "["
+            i += 1
+            if i < len(pattern) and pattern[i] == "!":
+                regex += "^"
+                i += 1
+            while i < len(pattern) and pattern[i] != "]":
+                if pattern[i] in "\\^$.|()+*?":
+                    regex += "\\"
+                regex += pattern[i]
+                i += 1
+            regex += "]"
+        elif c == "{":
+            i += 1
+            close = pattern.find("}", i)
+            if close < 0:
+                close = len(pattern)
+            regex += "(" + "|".join(re.escape(p) for p in pattern[i:close].split(",")) + ")"
+            i = close
+        else:
+            regex += re.escape(c)
+        i += 1
+    return re.compile(regex + "$")
+
+
+def has_wildcard(address):
+    return any(c in address for c in WILDCARD_CHARS)
+
+
+class FastDispatcher:
+    """
+    Drop-in replacement for python-osc's Dispatcher on the receive path.
+
+    Subscribed addresses without wildcards live in a dict, so the usual case is one
+    lookup. Only wildcard subscriptions, or incoming addresses that are themselves
+    patterns, go through regex matching, and the result is cached per address.
+    Packets are parsed in place with struct.unpack_from instead of building
+    python-osc message objects.
+
+    Bundle timetags are not waited on: messages are dispatched as soon as they arrive.
+    Handlers are called as handler(address, *args) and return values are ignored.
+    """
+
+    def __init__(self):
+        self._exact = {}     # address -> [handler, ...]
+        self._patterns = []  # (pattern, compiled regex, [handler, ...])
+        self._cache = {}
+        self.packets = 0
+        self.messages = 0
+        self.unmatched = 0
+        self.parse_errors = 0
+
+    def map(self, address, handler):
+        """Registers handler for an address or an OSC address pattern."""
+        if has_wildcard(address):
+            for pattern, regex, handlers in self._patterns:
+                if pattern == address:
+                    handlers.append(handler)
+                    break
+            else:
+                self._patterns.append((address, compile_pattern(address), [handler]))
+        else:
+            self._exact.setdefault(address, []).append(handler)
+        self._cache.clear()
+
+    def handlers_for_address(self, address):
+        """Returns a tuple of handlers for an incoming address (or address pattern)."""
+        handlers = self._cache.get(address)
+        if handlers is not None:
+            return handlers
+        if has_wildcard(address):
+            # The sender used a pattern: match it against every subscribed address.
+            regex = compile_pattern(address)
+            matched = []
+            for subscribed, subscribed_handlers in self._exact.items():
+                if regex.match(subscribed):
+                    matched.extend(subscribed_handlers)
+            for pattern, _, pattern_handlers in self._patterns:
+                if regex.match(pattern):
+                    matched.extend(pattern_handlers)
+        else:
+            matched = list(self._exact.get(address, ()))
+            for _, regex, pattern_handlers in self._patterns:
+                if regex.match(address):
+                    matched.extend(pattern_handlers)
+        handlers = tuple(matched)
+        if len(self._cache) >= CACHE_SIZE:
+            self._cache.clear()
+        self._cache[address] = handlers
+        return handlers
+
+    @Trace.traced("osc.dispatch", "osc")
+    def call_handlers_for_packet(self, data, client_address):
+        """Parses a datagram and calls the handlers for each message. Same signature as python-osc."""
+        self.packets += 1
+        try:
+            for _, address, args in parse_packet(data):
+                self.messages += 1
+                handlers = self.handlers_for_address(address)
+                if not handlers:
+                    self.unmatched += 1
+                    continue
+                for handler in handlers:
+                    handler(address, *args)
+        except ParseError as e:
+            self.parse_errors += 1
+            log.debug("Dropped malformed OSC packet from {}: {}".format(client_address, e))
+        return []
+
+    def stats(self):
+        return {
+            'packets': self.packets,
+            'messages': self.messages,
+            'unmatched': self.unmatched,
+            'parse_errors': self.parse_errors,
+            'exact_addresses': len(self._exact),
+            'patterns': len(self._patterns),
+        }
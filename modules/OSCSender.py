@@ -0,0 +1,201 @@
+import heapq
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from pythonosc import osc_bundle_builder
+from pythonosc import osc_message_builder
+
+log = logging.getLogger("OSCSENDER")
+
+LATENCY_SAMPLES = 500
+
+_STOP = object()
+
+
+def build_message(address, args):
+    """Builds a python-osc OscMessage from an address and argument sequence."""
+    builder = osc_message_builder.OscMessageBuilder(address=address)
+    for arg in args:
+        builder.add_arg(arg)
+    return builder.build()
+
+
+class OSCSender:
+    """
+    Non-blocking outbound OSC queue drained by one sender thread.
+
+    Messages queued in the same tick (everything waiting when the thread wakes)
+    go out as a single OSC bundle. Messages with a send time are held until due
+    and sent in a bundle carrying that timetag. Addresses registered with
+    dedup() skip a message identical to the last one sent in their group.
+
+    Attributes:
+        max_queue (int): Queue bound; send() drops and counts messages beyond it.
+    """
+
+    def __init__(self, transmit, max_queue=256):
+        """
+        Args:
+            transmit (callable): Called on the sender thread with an OscMessage or OscBundle.
+            max_queue (int): Queue bound. Defaults to 256.
+        """
+        self._transmit = transmit
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._scheduled = []  # heap of (due_monotonic, seq, item)
+        self._seq = 0
+        self._dedup = {}  # address -> group
+        self._last_in_group = {}  # group -> (address, args)
+        self._latency = deque(maxlen=LATENCY_SAMPLES)
+
+        self.messages_sent = 0
+        self.packets_sent = 0
+        self.bundles_sent = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.max_latency = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="osc-sender")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def dedup(self, address, group=None):
+        """
+        Suppresses consecutive identical messages to address.
+
+        Args:
+            address (str): OSC address.
+            group (str): Addresses sharing a group are one state stream, so e.g. pickup/hangup
+                         only suppress a repeat with no other change in between. Defaults to address.
+        """
+        self._dedup[address] = group or address
+
+    def send(self, address, args, at=None):
+        """
+        Queues a message without blocking.
+
+        Args:
+            address (str): OSC address.
+            args (tuple): Message arguments.
+            at (float): Optional wall-clock send time (time.time() seconds). Defaults to now.
+
+        Returns:
+            bool: False if the queue was full and the message was dropped.
+        """
+        now = time.monotonic()
+        due = now if at is None else now + max(0.0, at - time.time())
+        try:
+            self._queue.put_nowait((now, due, at, address, tuple(args)))
+        except queue.Full:
+            self.dropped += 1
+            log.warning("OSC send queue full. Dropped {}".format(address))
+            return False
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return True
+
+    def stop(self, timeout=1.0):
+        """Sends whatever is queued (scheduled messages are sent immediately) and ends the thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            timeout = None
+            if self._scheduled:
+                timeout = max(0.0, self._scheduled[0][0] - time.monotonic())
+            try:
+                first = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                first = None
+            items = [] if first is None else [first]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            now = time.monotonic()
+            immediate = []
+            for item in items:
+                if item is _STOP:
+                    stopping = True
+                elif item[1] > now:
+                    self._seq += 1
+                    heapq.heappush(self._scheduled, (item[1], self._seq, item))
+                else:
+                    immediate.append(item)
+
+            groups = []
+            if immediate:
+                groups.append((osc_bundle_builder.IMMEDIATELY, immediate))
+            while self._scheduled and (stopping or self._scheduled[0][0] <= now):
+                item = heapq.heappop(self._scheduled)[2]
+                if groups and groups[-1][0] == item[2]:
+                    groups[-1][1].append(item)
+                else:
+                    groups.append((item[2], [item]))
+            for timetag, group in groups:
+                self._send_group(timetag, group)
+
+    def _send_group(self, timetag, items):
+        messages = []
+        states = {} # Group states in this packet; only remembered once it has been sent
+        for enqueued, due, at, address, args in items:
+            group = self._dedup.get(address)
+            if group is not None:
+                if states.get(group, self._last_in_group.get(group)) == (address, args):
+                    self.deduplicated += 1
+                    continue
+                states[group] = (address, args)
+            messages.append((due, build_message(address, args)))
+        if not messages:
+            return
+        try:
+            if len(messages) == 1 and timetag is osc_bundle_builder.IMMEDIATELY:
+                self._transmit(messages[0][1])
+            else:
+                bundle = osc_bundle_builder.OscBundleBuilder(timetag)
+                for _, msg in messages:
+                    bundle.add_content(msg)
+                self._transmit(bundle.build())
+                self.bundles_sent += 1
+        except Exception as e:
+            self.errors += 1
+            log.error("Error sending OSC packet ({} messages): {}".format(len(messages), e))
+            return
+        self._last_in_group.update(states)
+        sent_at = time.monotonic()
+        self.packets_sent += 1
+        self.messages_sent += len(messages)
+        for due, _ in messages:
+            latency = sent_at - due
+            self._latency.append(latency)
+            if latency > self.max_latency:
+                self.max_latency = latency
+
+    def stats(self):
+        """Returns queue depth, counters and send latency (queue to wire) in milliseconds."""
+        samples = sorted(self._latency)
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'scheduled': len(self._scheduled),
+            'messages_sent': self.messages_sent,
+            'packets_sent': self.packets_sent,
+            'bundles_sent': self.bundles_sent,
+            'deduplicated': self.deduplicated,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'mean_latency_ms': (sum(samples) / len(samples) * 1000) if samples else 0.0,
+            'p99_latency_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000 if samples else 0.0,
+            'max_latency_ms': self.max_latency * 1000,
+        }
@@ -5,6 +5,9 @@ import time
 
 from modules.RotaryDial import RotaryDial
 from modules.Handset import Handset
+from modules.Ringer import Ringer
+from modules import Trace
+from modules import Metrics
 
 
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "DEBUG"))
@@ -14,6 +17,13 @@ PIN_LEFT_RING = 23
 PIN_RIGHT_RING = 24
 PIN_HOOKSWITCH = 8
 
+SELF_TEST_PHRASE = "Ready to work, captain"
+
+PICKUPS = Metrics.counter("phone_pickups_total", "Times the handset was lifted")
+HANGUPS = Metrics.counter("phone_hangups_total", "Times the handset was put down")
+NUMBERS_DIALED = Metrics.counter("phone_numbers_dialed_total", "Numbers dialed")
+HOOK_CALLBACK_SECONDS = Metrics.histogram("phone_hook_callback_seconds", "Time spent handling a hook switch edge", labels=("edge",))
+
 class Phone:
     dial = None
     handset = None
@@ -28,56 +38,81 @@ class Phone:
         #cb_got_digit dialer calls function when user has dialed first digit
 
         self.hookswitch = gpiozero.Button(pin=PIN_HOOKSWITCH, pull_up=True)
-        self.hookswitch.when_pressed = lambda: (
-            log.debug("Phone off hook"),
-            self.handset.off_hook(),    
-            pick_up_cb()                 
-        )
-        self.hookswitch.when_released = lambda: (
-            log.debug("Phone on hook"),  
-            self.handset.on_hook(),      
-            hang_up_cb()                 
-        )
+        self.hookswitch.when_pressed = lambda: self._picked_up(pick_up_cb)
+        self.hookswitch.when_released = lambda: self._hung_up(hang_up_cb)
 
         self.leftRing = gpiozero.OutputDevice(PIN_LEFT_RING)
         self.rightRing = gpiozero.OutputDevice(PIN_RIGHT_RING)
-
-        if not os.environ.get("SKIP_TEST"):
-            log.debug("Testing ringer...")
-            time.sleep(1)
-            self.single_ring()
-            log.debug("Testing handset...")
-            self.handset.set_volume(1)
-            self.handset.speak("Ready to work, captain")
-            self.handset.set_volume(0.75)
+        self.ringer = Ringer(self.leftRing, self.rightRing)
+
+    def _picked_up(self, pick_up_cb):
+        Trace.begin_interaction() # Everything until the next pick-up is traced as this visitor's call
+        PICKUPS.inc()
+        start = time.monotonic()
+        with Trace.span("phone.pickup", "gpio"):
+            log.debug("Phone off hook")
+            self.ringer.cancel()
+            self.handset.off_hook()
+            pick_up_cb()
+        HOOK_CALLBACK_SECONDS.labels("pickup").observe(time.monotonic() - start)
+
+    def _hung_up(self, hang_up_cb):
+        HANGUPS.inc()
+        start = time.monotonic()
+        with Trace.span("phone.hangup", "gpio"):
+            log.debug("Phone on hook")
+            self.handset.on_hook()
+            hang_up_cb()
+        Trace.end_interaction() # Idle refreshes and sends until the next pick-up belong to no call
+        HOOK_CALLBACK_SECONDS.labels("hangup").observe(time.monotonic() - start)
+
+    def warm_up(self):
+        """Renders and decodes the self-test phrase so self_test() doesn't wait on espeak."""
+        self.handset.pre_render_speech([SELF_TEST_PHRASE])
+
+    def self_test(self):
+        """
+        Rings once and speaks a phrase so whoever is setting up can hear the phone works.
+        The phrase is played directly rather than through speak(), which stays silent
+        while the handset is on hook, as it is at boot.
+        """
+        log.debug("Testing ringer...")
+        self.single_ring()
+        time.sleep(1)
+        log.debug("Testing handset...")
+        path = self.handset.render_speech(SELF_TEST_PHRASE)
+        if not path:
+            log.warning("Handset self-test skipped: could not render '{}'".format(SELF_TEST_PHRASE))
+            return
+        self.handset.set_volume(1)
+        handle = self.handset.play_file(path)
+        if handle:
+            handle.wait(timeout=10)
+        self.handset.set_volume(0.75)
 
     def stop(self):
+        log.debug("Ringer timing: {}".format(self.ringer.jitter_stats()))
+        self.ringer.stop()
         self.kill_ringer()
         self.handset.stop()
         self.dial.stop()
 
     def single_ring(self):
-        log.info("Ringing...")
-        for rings in range(0, 10):
-            self.rightRing.off()
-            self.leftRing.on()
-
-            time.sleep(0.05)
+        """Rings once without blocking the caller."""
+        self.ring("single")
 
-            self.leftRing.off()
-            self.rightRing.on()
-
-            time.sleep(0.05)
-
-            self.rightRing.off()
-            self.leftRing.off()
+    def ring(self, cadence="single", repeats=1):
+        """Starts a ringer cadence (see modules.Ringer.CADENCES) on the ringer thread."""
+        self.ringer.ring(cadence, repeats)
 
     def kill_ringer(self):
+        self.ringer.cancel()
         self.rightRing.off()
         self.leftRing.off()
 
     def call(self, number):
         log.info("calling " + str(number))
+        NUMBERS_DIALED.inc()
         self.dial.cancel_dial_timer()
         
 
@@ -93,4 +128,4 @@ class Phone:
 
     def cb_got_digit(self):
         log.debug("Dial has notified phone about first digit. Stopping ringtone")
-        self.handset.stop()
+        self.handset.stop_loop()
@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger("RINGER")
+
+HALF_CYCLE = 0.05 # Seconds each coil is energised; two half-cycles make one strike of the bell
+
+# Named cadences as lists of (ring_seconds, silence_seconds) segments.
+CADENCES = {
+    "single": [(1.0, 0.0)],             # The original one second test ring
+    "uk": [(0.4, 0.2), (0.4, 2.0)],     # UK double ring
+    "us": [(2.0, 4.0)],                 # US single ring
+}
+
+JITTER_SAMPLES = 500
+
+
+class Ringer:
+    """
+    Drives the two ringer coils from a dedicated timer thread.
+
+    ring() returns immediately; the cadence plays on the ringer thread with edges
+    scheduled against a fixed monotonic timeline so timing does not drift. cancel()
+    (e.g. from the hookswitch pickup callback) stops the bell within one half-cycle.
+
+    Attributes:
+        left: Output device for the left coil (anything with on()/off()).
+        right: Output device for the right coil.
+        half_cycle (float): Seconds per coil pulse.
+    """
+
+    def __init__(self, left, right, half_cycle=HALF_CYCLE):
+        """
+        Args:
+            left: Left coil output device.
+            right: Right coil output device.
+            half_cycle (float): Seconds per coil pulse. Defaults to HALF_CYCLE.
+        """
+        self.left = left
+        self.right = right
+        self.half_cycle = half_cycle
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._cancel = threading.Event()
+        self._pending = None
+        self._ringing = False
+        self._stopping = False
+
+        self._jitter = deque(maxlen=JITTER_SAMPLES)
+        self.edges = 0
+        self.max_jitter = 0.0
+        self.rings_started = 0
+        self.rings_cancelled = 0
+
+        self._thread = threading.Thread(target=self._run, name="ringer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def is_ringing(self):
+        return self._ringing
+
+    def ring(self, cadence="single", repeats=1):
+        """
+        Starts ringing without blocking. Replaces any ring in progress.
+
+        Args:
+            cadence: Name from CADENCES, or a list of (ring_seconds, silence_seconds) pairs.
+            repeats (int): Number of times to play the cadence.
+        """
+        segments = CADENCES.get(cadence) if isinstance(cadence, str) else cadence
+        if not segments:
+            raise ValueError("Unknown cadence: {}".format(cadence))
+        segments = [(float(on), float(off)) for on, off in segments]
+        with self._lock:
+            self._pending = (segments, max(1, int(repeats)))
+            self._cancel.set() # Interrupt the current ring, if any
+        self._wake.set()
+        log.debug("Ring requested: {} x{}".format(cadence, repeats))
+
+    def cancel(self):
+        """Stops the bell within one half-cycle and drops any queued ring."""
+        with self._lock:
+            self._pending = None
+            self._cancel.set()
+
+    def stop(self):
+        """Cancels ringing and ends the ringer thread."""
+        self._stopping = True
+        self.cancel()
+        self._wake.set()
+        self._thread.join(timeout=1)
+        self._coils_off()
+
+    def _coils_off(self):
+        self.left.off()
+        self.right.off()
+
+    def _run(self):
+        while not self._stopping:
+            with self._lock:
+                job, self._pending = self._pending, None
+                if job:
+                    self._cancel.clear()
+            if job is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            self._ringing = True
+            self.rings_started += 1
+            try:
+                if not self._play(*job):
+                    self.rings_cancelled += 1
+                    log.debug("Ring cancelled.")
+            except Exception as e:
+                log.error("Error while ringing: {}".format(e), exc_info=True)
+            finally:
+                self._coils_off()
+                self._ringing = False
+
+    def _wait_until(self, deadline):
+        """Sleeps until deadline. Returns False if cancelled first."""
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            return not self._cancel.wait(remaining)
+        return not self._cancel.is_set()
+
+    def _edge(self, scheduled):
+        lateness = time.monotonic() - scheduled
+        self._jitter.append(lateness)
+        self.edges += 1
+        if lateness > self.max_jitter:
+            self.max_jitter = lateness
+
+    def _play(self, segments, repeats):
+        """Plays the cadence. Returns True if it ran to the end."""
+        log.info("Ringing...")
+        next_edge = time.monotonic()
+        for _ in range(repeats):
+            for ring_seconds, silence_seconds in segments:
+                for i in range(int(round(ring_seconds / self.half_cycle))):
+                    if not self._wait_until(next_edge):
+                        return False
+                    if i % 2 == 0:
+                        self.right.off()
+                        self.left.on()
+                    else:
+                        self.left.off()
+                        self.right.on()
+                    self._edge(next_edge)
+                    next_edge += self.half_cycle
+                if not self._wait_until(next_edge):
+                    return False
+                self._coils_off()
+                self._edge(next_edge)
+                next_edge += silence_seconds
+        return True
+
+    def jitter_stats(self):
+        """Returns edge timing statistics (actual minus scheduled) in milliseconds."""
+        samples = sorted(self._jitter)
+        stats = {
+            'edges': self.edges,
+            'mean_ms': 0.0,
+            'p99_ms': 0.0,
+            'max_ms': self.max_jitter * 1000,
+            'rings_started': self.rings_started,
+            'rings_cancelled': self.rings_cancelled,
+        }
+        if samples:
+            stats['mean_ms'] = sum(samples) / len(samples) * 1000
+            stats['p99_ms'] = samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+        return stats
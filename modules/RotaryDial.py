@@ -1,10 +1,9 @@
 import gpiozero
-from threading import Timer
+import threading
 import time
 import logging
 import os
-
-from modules.Utils import kill_timer
+from collections import deque
 
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "DEBUG"))
 log = logging.getLogger("DIAL")
@@ -15,43 +14,200 @@ MAX_DIAL_DIGITS = 3
 
 DIGIT_TIMEOUT = 5 #Time between dialling numbers. If this elapses, current number is called.
 
-class RotaryDial:
+# A dial pulses at about 10 pps (one edge per ~100 ms), with a longer pause between digits.
+PULSE_GAP = 0.15 # Seconds after the last pulse before the digit is complete
+DEBOUNCE = 0.02 # Edges closer together than this are contact bounce
+
+LATENCY_SAMPLES = 200
+
+
+class PulseDecoder:
+    """
+    Turns pulse edge timestamps into digits and numbers. Pure and clock-free: every
+    decision is made from the timestamps passed in, so synthetic traces decode exactly
+    like real ones.
+
+    add_edge(t) records a pulse; poll(now) returns whatever completed by `now`.
+    Events are ('digit', d) and ('number', "123").
+    """
+
+    def __init__(self, max_digits=MAX_DIAL_DIGITS, digit_timeout=DIGIT_TIMEOUT, pulse_gap=PULSE_GAP,
+                 debounce=DEBOUNCE):
+        self.max_digits = max_digits
+        self.digit_timeout = digit_timeout
+        self.pulse_gap = pulse_gap
+        self.debounce = debounce
+        self.bounces = 0
+        self.invalid_digits = 0
+        self.reset()
+
+    def reset(self):
+        """Drops the digit and number in progress."""
+        self.pulses = 0
+        self.last_edge = None
+        self.number = ""
+        self.digit_done_at = None
+
+    def abandon_number(self):
+        """Drops the digits dialed so far but keeps a digit whose pulses are still arriving."""
+        self.number = ""
+        self.digit_done_at = None
+
+    def add_edge(self, t):
+        """Records a pulse edge at monotonic time t. Returns events completed before it."""
+        events = self.poll(t)
+        if self.last_edge is not None and t - self.last_edge < self.debounce:
+            self.bounces += 1
+            return events
+        self.pulses += 1
+        self.last_edge = t
+        return events
+
+    def next_deadline(self):
+        """Monotonic time of the next digit or number completion, or None when idle."""
+        if self.pulses:
+            return self.last_edge + self.pulse_gap
+        if self.number:
+            return self.digit_done_at + self.digit_timeout
+        return None
+
+    def poll(self, now):
+        """Returns the events that completed by `now`."""
+        events = []
+        if self.pulses and now >= self.last_edge + self.pulse_gap:
+            count, self.pulses = self.pulses, 0
+            if count > 10:
+                self.invalid_digits += 1
+                log.debug("Ignoring {} pulses, not a digit".format(count))
+            else:
+                digit = count % 10 # Ten pulses dial 0
+                self.number += str(digit)
+                events.append(('digit', digit))
+                if len(self.number) >= self.max_digits:
+                    events.append(('number', self.number))
+                    self.number = ""
+                else:
+                    self.digit_done_at = self.last_edge + self.pulse_gap
+        if not self.pulses and self.number and now >= self.digit_done_at + self.digit_timeout:
+            events.append(('number', self.number))
+            self.number = ""
+        return events
 
-    dialTimer = None
-    last_input = 0
 
-    cb_number_dialed = None #callback function for when number is dialled
+class RotaryDial:
+    """
+    Decodes the dial on one worker thread. The GPIO callback only timestamps the
+    edge and appends it to a deque (atomic, no lock); the worker sleeps until the
+    next edge or the decoder's next deadline, so digits and numbers are reported
+    within a few ms of becoming complete.
+    """
 
-    current_number = ""
+    cb_number_dialed = None #callback function for when number is dialled
 
-    def __init__(self):
+    def __init__(self, pin=PIN_DIAL, max_digits=MAX_DIAL_DIGITS, digit_timeout=DIGIT_TIMEOUT):
         log.debug("Initializing dial")
-        self.dial = gpiozero.Button(pin=PIN_DIAL, pull_up=True, bounce_time=0.05)
+        self.cb_dial_number = None
+        self.cb_got_digit = None
+        self._decoder = PulseDecoder(max_digits=max_digits, digit_timeout=digit_timeout)
+        self._edges = deque()
+        self._wake = threading.Event()
+        self._reset = False
+        self._stopping = False
+        self._digits_in_number = 0
+        self._latency = deque(maxlen=LATENCY_SAMPLES)
+        self.digits = 0
+        self.numbers = 0
+
+        self._thread = threading.Thread(target=self._run, name="dial")
+        self._thread.daemon = True
+        self._thread.start()
+
+        # Debouncing is done on timestamps by the decoder; the pin only filters glitches.
+        self.dial = gpiozero.Button(pin=pin, pull_up=True, bounce_time=0.005)
         self.dial.when_pressed = self.cb_dial_triggered
 
-
-  #If digit meets MAX_DIAL_DIGIT length, call number. Otherwise reset dial timer.
-    def got_digit(self, digit):
-        log.debug("got digit")
-        return
-
+    @property
+    def current_number(self):
+        return self._decoder.number
 
     def cb_dial_triggered(self):
-        log.debug("ignoring dial trigger")
-
-
-    def cb_dial_timer(self):
-        log.debug("Dial timer elapsed")
+        self.feed_edge(time.monotonic())
+
+    def feed_edge(self, timestamp):
+        """Queues a pulse edge with its monotonic timestamp (also used to replay synthetic traces)."""
+        self._edges.append(timestamp)
+        self._wake.set()
+
+    def _run(self):
+        decoder = self._decoder
+        while not self._stopping:
+            deadline = decoder.next_deadline()
+            self._wake.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            self._wake.clear()
+            if self._reset:
+                self._reset = False
+                self._edges.clear()
+                decoder.reset()
+                self._digits_in_number = 0
+                continue
+            events = []
+            while self._edges:
+                events += decoder.add_edge(self._edges.popleft())
+            deadline = decoder.next_deadline()
+            now = time.monotonic()
+            events += decoder.poll(now)
+            if events and deadline is not None:
+                self._latency.append(max(0.0, now - deadline))
+            for event in events:
+                self._emit(*event)
+
+    def _emit(self, kind, value):
+        try:
+            if kind == 'digit':
+                self.digits += 1
+                self._digits_in_number += 1
+                log.debug("got digit {}".format(value))
+                if self._digits_in_number == 1 and self.cb_got_digit:
+                    self.cb_got_digit()
+            else:
+                self.numbers += 1
+                self._digits_in_number = 0
+                log.info("Number dialed: {}".format(value))
+                if self.cb_dial_number:
+                    self.cb_dial_number(value)
+        except Exception as e:
+            log.error("Error in dial callback: {}".format(e), exc_info=True)
 
     def cancel_dial_timer(self):
+        """Abandons the number being dialed (e.g. once it has been called)."""
         log.debug("Cancelling dial timer")
-        if self.dialTimer is not None:
-            self.dialTimer.cancel()
+        if threading.current_thread() is self._thread:
+            # Called from a dial callback. Edges already queued or counted belong to the
+            # next number, so only the digits so far are dropped.
+            self._decoder.abandon_number()
+            self._digits_in_number = 0
+            return
+        self._reset = True
+        self._wake.set()
 
     def register_callback(self, cb_dial_number, cb_got_digit):
         self.cb_dial_number = cb_dial_number
         self.cb_got_digit = cb_got_digit
-        
+
+    def decode_stats(self):
+        """Returns digit/number counts, rejected input, and ms from completion to callback."""
+        samples = sorted(self._latency)
+        return {
+            'digits': self.digits,
+            'numbers': self.numbers,
+            'bounces': self._decoder.bounces,
+            'invalid_digits': self._decoder.invalid_digits,
+            'mean_latency_ms': (sum(samples) / len(samples) * 1000) if samples else 0.0,
+            'max_latency_ms': samples[-1] * 1000 if samples else 0.0,
+        }
 
     def stop(self):
-        kill_timer(self.dialTimer)
\ No newline at end of file
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout=1)
+        self.dial.close()
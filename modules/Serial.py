@@ -1,15 +1,130 @@
 import serial
+import json
 import logging
 import os
 import threading
 import time
+from collections import deque, OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import serial.tools.list_ports
 
+from modules import Trace
+from modules import Metrics
+
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "DEBUG"))
 log = logging.getLogger("SERIAL")
 
+BAUD_RATE = 500000 # Must match BAUD_RATE in arduino/fire/fire.ino; fast enough for 30 fps LED frames
+READ_TIMEOUT = 0.5 # Seconds a blocking read waits before re-checking for stop(); data wakes it immediately
+MAX_LINE = 256 # Bytes buffered without a newline before the partial line is discarded
+REPLY_TIMEOUT = 1.0
+LATENCY_SAMPLES = 200
+UNKNOWN_COMMAND = "Unknown command: "
+FRAME_ACK = "K" # Line the sketch prints after showing a streamed LED frame (see modules/LedStream.py)
+FRAME_ERROR = "Frame error" # Line the sketch prints for an LED frame with a bad checksum
+MAX_QUEUE = 32 # Pending writes before send_command() drops
+PORT_CACHE_FILE = "cache/serial-ports.json" # Last good device per port_pattern
+RECONNECT_MIN_DELAY = 0.5 # Seconds before the first reconnect attempt; doubles per failure
+RECONNECT_MAX_DELAY = 10.0
+
+ERRORS = Metrics.counter("phone_serial_errors_total", "Serial failures", labels=("kind",))
+REPLY_SECONDS = Metrics.histogram("phone_serial_reply_seconds", "Round trip from writing a command to its reply")
+COMMANDS_WRITTEN = Metrics.counter("phone_serial_commands_total", "Commands written to the Arduino")
+
+# Device each state command belongs to; a newer state for a device replaces a queued older one.
+COMMAND_DEVICE = {
+    'L1': 'light',
+    'L0': 'light',
+    'S1': 'smoke',
+    'S0': 'smoke',
+}
+
+# Reply the Arduino prints for each command (see arduino/fire/fire.ino)
+REPLIES = {
+    'L1': "Light ON",
+    'L0': "Light OFF",
+    'S1': "Smoke ON",
+    'S0': "Smoke OFF",
+}
+
+
+class LineParser:
+    """
+    Incremental newline framing over one reusable buffer.
+
+    feed() takes whatever bytes a read returned and returns the complete lines
+    in them; a partial line stays buffered until the rest arrives.
+    """
+
+    def __init__(self, max_line=MAX_LINE):
+        self.max_line = max_line
+        self._buffer = bytearray()
+        self.overflows = 0
+        self.decode_errors = 0
+
+    def feed(self, data):
+        """Returns the decoded, stripped, non-empty lines completed by data."""
+        self._buffer += data
+        lines = []
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n", start)
+            if end < 0:
+                break
+            raw = self._buffer[start:end]
+            start = end + 1
+            try:
+                line = raw.decode('utf-8').strip()
+            except UnicodeDecodeError:
+                self.decode_errors += 1
+                continue
+            if line:
+                lines.append(line)
+        if start:
+            del self._buffer[:start]
+        if len(self._buffer) > self.max_line:
+            self.overflows += 1
+            del self._buffer[:]
+        return lines
+
+
+class _PendingRequest:
+    def __init__(self, command, expect):
+        self.command = command
+        self.expect = expect
+        self.sent = time.monotonic()
+        self.event = threading.Event()
+        self.reply = None
+
+
+def _same_device(port, serial_number, hwid):
+    """Whether a comports() entry is the device with this serial number (or hwid, if it has none)."""
+    if serial_number:
+        return port.serial_number == serial_number
+    return bool(hwid) and port.hwid == hwid
+
+
+def _load_port_cache():
+    try:
+        with open(PORT_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_port_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(PORT_CACHE_FILE), exist_ok=True)
+        tmp_path = PORT_CACHE_FILE + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, PORT_CACHE_FILE)
+    except OSError as e:
+        log.debug("Could not save port cache: {}".format(e))
+
+
 class Serial:
-    def __init__(self, port=None, port_pattern=None, baud_rate=9600):
+    def __init__(self, port=None, port_pattern=None, baud_rate=BAUD_RATE):
         """Initialize serial connection with configurable port and baud rate.
         
         Args:
@@ -17,9 +132,12 @@ class Serial:
             port_pattern: Pattern to search for in port descriptions/hardware IDs
             baud_rate: Baud rate for serial connection
             
+        If the device isn't there yet (e.g. the Arduino is unplugged at boot), the
+        connection starts down and the reader thread keeps retrying; commands queue
+        until it comes up. See connected and connection_stats().
+
         Raises:
             ValueError: If both port and port_pattern are provided, or if neither is provided
-            serial.SerialException: If no matching port is found or connection fails
         """
         if port and port_pattern:
             raise ValueError("Cannot specify both port and port_pattern")
@@ -27,17 +145,45 @@ class Serial:
             raise ValueError("Must specify either port or port_pattern")
 
         self.baud_rate = baud_rate
+        self.port_pattern = port_pattern
         self.serial = None
         self.running = False
         self.reader_thread = None
+        self._stop_event = threading.Event()
+        self._identity = None  # (serial_number, hwid) of the connected device, when known
+        self.connected = False
+        self._state_lock = threading.Lock()
+        self.reconnects = 0
+        self.disconnects = 0
+        self.downtime_total = 0.0
+        self._down_since = None
+        self.last_error = None
+        self._parser = LineParser()
+        self._subscribers = []  # (prefix, callback)
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._latency = {}  # command -> deque of round-trip seconds
+        self.timeouts = {}
+        self.lines_received = 0
+
+        self.writer_thread = None
+        self._write_lock = threading.Lock()
+        self._outbox = OrderedDict()  # device (or unique key) -> (command, [futures])
+        self._outbox_cond = threading.Condition()
+        self._writing = False
+        self._write_seq = 0
+        self.commands_queued = 0
+        self.commands_written = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.write_errors = 0
 
         if port_pattern:
             log.debug("Searching for port matching pattern: {}".format(port_pattern))
             self.port = self._find_port_by_pattern(port_pattern)
-            if not self.port:
-                raise serial.SerialException(
-                    "No port found matching pattern: {}".format(port_pattern))
-            log.debug("Found matching port: {}".format(self.port))
+            if self.port:
+                log.debug("Found matching port: {}".format(self.port))
         else:
             self.port = port
             
@@ -57,29 +203,64 @@ class Serial:
 
     def _find_port_by_pattern(self, pattern):
         """Find a port matching the given pattern in description or hardware ID.
-        
+
+        Candidates are not opened here (opening resets the Arduino); connect() tries them.
+        The device cached for this pattern, matched by serial number or hwid, comes first.
+
         Args:
             pattern: String to search for in port description or hardware ID
             
         Returns:
             Port device name if found, None otherwise
         """
+        candidates = self._candidate_ports(pattern)
+        return candidates[0] if candidates else None
+
+    def _candidate_ports(self, pattern):
+        """Returns matching device names, the last known good device first."""
+        cached = _load_port_cache().get(pattern)
+        candidates = []
         for port in serial.tools.list_ports.comports():
-            if (pattern.lower() in port.description.lower() or 
-                pattern.lower() in port.hwid.lower()):
-                try:
-                    # Test if we can open the port
-                    test_serial = serial.Serial(port.device, self.baud_rate, timeout=1)
-                    test_serial.close()
+            if cached and _same_device(port, cached.get('serial_number'), cached.get('hwid')):
+                candidates.insert(0, port.device)
+            elif (pattern.lower() in (port.description or "").lower() or
+                    pattern.lower() in (port.hwid or "").lower()):
+                candidates.append(port.device)
+        return candidates
+
+    def _locate(self):
+        """Polls comports() for the device we were connected to. Returns its current name or None."""
+        if self._identity:
+            for port in serial.tools.list_ports.comports():
+                if _same_device(port, *self._identity):
                     return port.device
-                except (OSError, serial.SerialException):
-                    continue
-        return None
+            return None
+        if self.port_pattern:
+            return self._find_port_by_pattern(self.port_pattern)
+        return self.port if os.path.exists(self.port) else None
+
+    def _remember_port(self):
+        """Records the connected device's identity and caches it for port_pattern."""
+        for port in serial.tools.list_ports.comports():
+            if port.device == self.port:
+                if port.serial_number or port.hwid:
+                    self._identity = (port.serial_number, port.hwid)
+                break
+        if self.port_pattern and self._identity:
+            cache = _load_port_cache()
+            cache[self.port_pattern] = {
+                'device': self.port,
+                'serial_number': self._identity[0],
+                'hwid': self._identity[1],
+            }
+            _save_port_cache(cache)
 
     def try_ports(self, port_list):
         """Try to connect to a list of ports in sequence.
         Returns the first successful port or None."""
         for port in port_list:
+            if not os.path.exists(port):
+                continue
             try:
                 test_serial = serial.Serial(port, self.baud_rate, timeout=1)
                 test_serial.close()
@@ -90,18 +271,101 @@ class Serial:
         return None
 
     def connect(self):
-        """Establish serial connection and start reader thread."""
-        try:
-            self.serial = serial.Serial(
-                port=self.port,
-                baudrate=self.baud_rate,
-                timeout=1  # 1 second timeout for reading
-            )
+        """
+        Opens the port and starts the reader and writer threads. If no candidate can be
+        opened the link starts down and the reader thread retries with backoff.
+        """
+        candidates = [self.port] if self.port else []
+        if self.port_pattern:
+            candidates += [p for p in self._candidate_ports(self.port_pattern) if p != self.port]
+        error = None
+        for device in candidates:
+            try:
+                self._open(device)
+                break
+            except serial.SerialException as e:
+                log.debug("Failed to open {}: {}".format(device, e))
+                error = e
+        else:
+            ERRORS.labels("connect").inc()
+            self.last_error = str(error) if error else "No port found matching pattern: {}".format(self.port_pattern)
+            self._down_since = time.monotonic()
+            log.error("Failed to connect to serial port: {}. Will keep retrying.".format(self.last_error))
+        if self.connected:
             log.debug("Serial connection established successfully")
-            self.start_reader()
-        except serial.SerialException as e:
-            log.error("Failed to connect to serial port: {}".format(e))
-            raise
+            self._remember_port()
+        self.start_reader()
+        self.start_writer()
+
+    def _open(self, device):
+        self.serial = serial.Serial(
+            port=device,
+            baudrate=self.baud_rate,
+            timeout=READ_TIMEOUT
+        )
+        self.port = device
+        self.connected = True
+
+    def _connection_lost(self, error):
+        """
+        Marks the link down after a read or write error; the reader thread then runs _reconnect().
+        Only the first report of a failure counts; later ones (e.g. the reader noticing the
+        port the writer closed) are ignored.
+        """
+        with self._state_lock:
+            if not self.connected:
+                return
+            self.connected = False
+        self.disconnects += 1
+        ERRORS.labels("disconnect").inc()
+        self.last_error = str(error)
+        self._down_since = time.monotonic()
+        log.error("Serial connection to {} lost: {}".format(self.port, error))
+        try:
+            self.serial.close()
+        except Exception:
+            pass
+        self._parser = LineParser()
+
+    def _reconnect(self):
+        """
+        Polls for the device to come back and reopens it, backing off exponentially.
+        Runs on the reader thread. Returns False if stop() was called first.
+        """
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop_event.wait(delay):
+            device = self._locate()
+            if device:
+                try:
+                    self._open(device)
+                except serial.SerialException as e:
+                    self.last_error = str(e)
+                    log.debug("Reconnect to {} failed: {}".format(device, e))
+                else:
+                    downtime = time.monotonic() - self._down_since
+                    self.downtime_total += downtime
+                    self._down_since = None
+                    self.reconnects += 1
+                    log.info("Serial reconnected on {} after {:.1f}s".format(device, downtime))
+                    self._remember_port()
+                    with self._outbox_cond:
+                        self._outbox_cond.notify()  # Send whatever state was queued while down
+                    return True
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        return False
+
+    def connection_stats(self):
+        """Returns connection state, reconnect count and downtime in seconds."""
+        down = time.monotonic() - self._down_since if self._down_since is not None else 0.0
+        return {
+            'connected': self.connected,
+            'port': self.port,
+            'reconnects': self.reconnects,
+            'disconnects': self.disconnects,
+            'downtime_total': self.downtime_total + down,
+            'current_downtime': down,
+            'last_error': self.last_error,
+        }
 
     def start_reader(self):
         """Start the background reader thread."""
@@ -110,23 +374,242 @@ class Serial:
         self.reader_thread.daemon = True  # Thread will exit when main program does
         self.reader_thread.start()
         
+    def start_writer(self):
+        """Start the background writer thread that drains send_command()."""
+        self._writing = True
+        self.writer_thread = threading.Thread(target=self._writer_thread, name="serial-writer")
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+    def send_command(self, command, coalesce=True):
+        """
+        Queues a command for the writer thread and returns immediately.
+
+        State commands (see COMMAND_DEVICE) replace a queued, not yet written command
+        for the same device and move to the back of the queue, so rapid toggles only
+        send the final state and it is written after any command queued in between.
+
+        Args:
+            command (str): Command without newline, e.g. 'L1'.
+            coalesce (bool): Whether this command may replace or be replaced by another state
+                             command for its device. Defaults to True.
+
+        Returns:
+            Future: Resolves to True once written, or False if superseded or dropped.
+                    Holds the exception if the write failed.
+        """
+        future = Future()
+        superseded = None
+        device = COMMAND_DEVICE.get(command) if coalesce else None
+        with self._outbox_cond:
+            if device is not None and device in self._outbox:
+                previous, superseded = self._outbox[device]
+                self._outbox[device] = (command, [future])
+                # Written after anything queued since, so the newest state always lands last.
+                self._outbox.move_to_end(device)
+                self.coalesced += 1
+                log.debug("Coalesced {} -> {}".format(previous, command))
+            elif len(self._outbox) >= MAX_QUEUE:
+                self.dropped += 1
+                ERRORS.labels("dropped").inc()
+                log.warning("Serial write queue full. Dropped {}".format(command))
+                future.set_result(False)
+                return future
+            else:
+                self._write_seq += 1
+                self._outbox[device or self._write_seq] = (command, [future])
+            self.commands_queued += 1
+            self._outbox_cond.notify()
+        for old in superseded or ():
+            old.set_result(False)
+        return future
+
+    def _writer_thread(self):
+        """Background thread that writes everything queued in one write() and flush()."""
+        while True:
+            with self._outbox_cond:
+                # Commands queued while disconnected wait here, coalescing, until the reconnect.
+                while (not self._outbox or not self.connected) and self._writing:
+                    self._outbox_cond.wait()
+                if not self._outbox:
+                    return
+                batch = list(self._outbox.values())
+                self._outbox.clear()
+            data = "".join(command + "\n" for command, _ in batch).encode('utf-8')
+            try:
+                self._write(data)
+            except (serial.SerialException, OSError) as e:
+                self.write_errors += 1
+                ERRORS.labels("write").inc()
+                log.error("Failed to send {}: {}".format([command for command, _ in batch], e))
+                self._connection_lost(e)
+                for _, futures in batch:
+                    for future in futures:
+                        future.set_exception(e)
+                continue
+            self.writes += 1
+            self.commands_written += len(batch)
+            COMMANDS_WRITTEN.inc(len(batch))
+            log.debug("Sent {}".format([command for command, _ in batch]))
+            for _, futures in batch:
+                for future in futures:
+                    future.set_result(True)
+
+    def _write(self, data):
+        if self.serial is None or not self.serial.is_open:
+            raise serial.SerialException("Serial port not open")
+        with self._write_lock:
+            self.serial.write(data)
+            self.serial.flush()
+
+    def write_stats(self):
+        """Returns writer queue depth and counters."""
+        with self._outbox_cond:
+            depth = len(self._outbox)
+        return {
+            'queue_depth': depth,
+            'commands_queued': self.commands_queued,
+            'commands_written': self.commands_written,
+            'writes': self.writes,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'write_errors': self.write_errors,
+        }
+
     def _reader_thread(self):
-        """Background thread that continuously reads from serial port."""
+        """Background thread that blocks on the port, dispatches each complete line and reconnects on failure."""
         while self.running:
-            if self.serial and self.serial.is_open and self.serial.in_waiting:
+            if not self.connected:
+                if not self._reconnect():
+                    break
+                continue
+            try:
+                # Blocks until at least one byte arrives (or READ_TIMEOUT), then takes everything waiting.
+                data = self.serial.read(max(1, self.serial.in_waiting))
+            except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+                if not self.running:
+                    break
+                self._connection_lost(e)
+                continue
+            if data:
+                for line in self._parser.feed(data):
+                    self._dispatch(line)
+
+    def subscribe(self, callback, prefix=""):
+        """
+        Registers callback(line) for lines from the Arduino starting with prefix
+        (e.g. "Light", "Smoke", "Unknown command"). An empty prefix receives every line.
+        Callbacks run on the reader thread and should return quickly.
+        """
+        self._subscribers.append((prefix, callback))
+
+    def _dispatch(self, line):
+        self.lines_received += 1
+        if line != FRAME_ACK:
+            log.info("arduino says: {}".format(line))
+        self._resolve_pending(line)
+        for prefix, callback in list(self._subscribers):
+            if line.startswith(prefix):
                 try:
-                    line = self.serial.readline().decode('utf-8').strip()
-                    if line:
-                        log.info("arduino says: {}".format(line))
-                except serial.SerialException as e:
-                    log.error("Error reading from serial: {}".format(e))
+                    callback(line)
+                except Exception as e:
+                    log.error("Error in serial callback for '{}': {}".format(line, e), exc_info=True)
+
+    def _resolve_pending(self, line):
+        rejected = line[len(UNKNOWN_COMMAND):] if line.startswith(UNKNOWN_COMMAND) else None
+        now = time.monotonic()
+        with self._pending_lock:
+            for i, pending in enumerate(self._pending):
+                if line == pending.expect or rejected == pending.command:
+                    del self._pending[i]
                     break
-                except UnicodeDecodeError as e:
-                    log.error("Error decoding message: {}".format(e))
-            time.sleep(0.01)  # Small delay to prevent CPU hogging
+            else:
+                return
+        pending.reply = line
+        if rejected is None:
+            self._latency.setdefault(pending.command, deque(maxlen=LATENCY_SAMPLES)).append(now - pending.sent)
+            REPLY_SECONDS.observe(now - pending.sent)
+        else:
+            ERRORS.labels("rejected").inc()
+        pending.event.set()
+
+    def request(self, command, timeout=REPLY_TIMEOUT):
+        """
+        Sends a command and waits for the Arduino's reply, recording the round-trip time.
+
+        Args:
+            command (str): A command from REPLIES (e.g. 'L1').
+            timeout (float): Seconds to wait for the reply, including the wait to be written.
+
+        Returns:
+            str: The reply line ("Light ON", or "Unknown command: ..."), or None on timeout
+                 or if the command was dropped before being written. A command still queued
+                 at the timeout (e.g. while disconnected) is taken off the queue.
+
+        Raises:
+            serial.SerialException, OSError: If the write failed.
+        """
+        pending = _PendingRequest(command, REPLIES.get(command))
+        with self._pending_lock:
+            self._pending.append(pending)
+        # Not coalesced: the caller is waiting for this exact reply.
+        written = self.send_command(command, coalesce=False)
+        try:
+            if not written.result(timeout):
+                self._forget_pending(pending)
+                log.warning("{} was dropped before being written".format(command))
+                return None
+        except FutureTimeoutError:
+            self._forget_pending(pending)
+            self._unqueue(written)
+            self._count_timeout(command, timeout)
+            return None
+        except Exception:
+            self._forget_pending(pending)
+            raise
+        if not pending.event.wait(max(0.0, pending.sent + timeout - time.monotonic())):
+            self._forget_pending(pending)
+            self._count_timeout(command, timeout)
+        return pending.reply
+
+    def _forget_pending(self, pending):
+        with self._pending_lock:
+            if pending in self._pending:
+                self._pending.remove(pending)
+
+    def _unqueue(self, future):
+        """Takes the command for future off the write queue if it hasn't been written yet."""
+        with self._outbox_cond:
+            for key, (_, futures) in self._outbox.items():
+                if future in futures:
+                    del self._outbox[key]
+                    break
+            else:
+                return
+        future.set_result(False)
+
+    def _count_timeout(self, command, timeout):
+        self.timeouts[command] = self.timeouts.get(command, 0) + 1
+        ERRORS.labels("timeout").inc()
+        log.warning("No reply to {} within {}s".format(command, timeout))
+
+    def latency_stats(self):
+        """Returns per-command round-trip times in milliseconds and timeout counts."""
+        stats = {}
+        for command in set(self._latency) | set(self.timeouts):
+            samples = sorted(self._latency.get(command, ()))
+            stats[command] = {
+                'count': len(samples),
+                'mean_ms': (sum(samples) / len(samples) * 1000) if samples else 0.0,
+                'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000 if samples else 0.0,
+                'max_ms': samples[-1] * 1000 if samples else 0.0,
+                'timeouts': self.timeouts.get(command, 0),
+            }
+        return stats
     
+    @Trace.traced("serial.send_string", "serial")
     def send_string(self, message):
-        """Send a string message over serial connection."""
+        """Send a string message over serial connection, blocking until written. See send_command()."""
         if self.serial is None:
             log.error("Serial port not open")
             return
@@ -134,39 +617,87 @@ class Serial:
             try:
                 # Add newline to ensure proper transmission
                 message = message + '\n'
-                self.serial.write(message.encode('utf-8'))
-                self.serial.flush()
+                with self._write_lock:
+                    self.serial.write(message.encode('utf-8'))
+                    self.serial.flush()
+                COMMANDS_WRITTEN.inc()
                 log.debug("Sent message: {}".format(message))
-            except serial.SerialException as e:
+            except (serial.SerialException, OSError) as e:
+                ERRORS.labels("write").inc()
                 log.error("Failed to send message: {}".format(e))
+                self._connection_lost(e)
                 raise
         else:
             log.error("Serial port not open")
-            raise serial.SerialException("Serial port not open")
+            error = serial.SerialException("Serial port not open")
+            self._connection_lost(error)
+            raise error
     
-    def light_on(self):
-        """Turn the light on."""
+    def send_bytes(self, data):
+        """
+        Writes raw bytes (e.g. a binary LED frame) on the caller's thread, between queued commands.
+
+        Raises:
+            serial.SerialException: If the port is not open or the write fails.
+        """
+        if not self.connected:
+            raise serial.SerialException("Serial port not open")
+        try:
+            self._write(data)
+        except (serial.SerialException, OSError) as e:
+            ERRORS.labels("write").inc()
+            self._connection_lost(e)
+            raise
+
+    def light_on(self, wait=False):
+        """
+        Turn the light on. Returns a Future from send_command() without blocking, or with
+        wait=True blocks for the reply and returns it (see request()).
+        """
         log.debug("Turning light on")
-        self.send_string('L1')
+        if wait:
+            return self.request('L1')
+        return self.send_command('L1')
     
-    def light_off(self):
-        """Turn the light off."""
+    def light_off(self, wait=False):
+        """
+        Turn the light off. Returns a Future from send_command() without blocking, or with
+        wait=True blocks for the reply and returns it (see request()).
+        """
         log.debug("Turning light off")
-        self.send_string('L0')
+        if wait:
+            return self.request('L0')
+        return self.send_command('L0')
     
-    def smoke_on(self):
-        """Turn the smoke machine on."""
+    def smoke_on(self, wait=False):
+        """
+        Turn the smoke machine on. Returns a Future from send_command() without blocking, or with
+        wait=True blocks for the reply and returns it (see request()).
+        """
         log.debug("Turning smoke on")
-        self.send_string('S1')
+        if wait:
+            return self.request('S1')
+        return self.send_command('S1')
     
-    def smoke_off(self):
-        """Turn the smoke machine off."""
+    def smoke_off(self, wait=False):
+        """
+        Turn the smoke machine off. Returns a Future from send_command() without blocking, or with
+        wait=True blocks for the reply and returns it (see request()).
+        """
         log.debug("Turning smoke off")
-        self.send_string('S0')
+        if wait:
+            return self.request('S0')
+        return self.send_command('S0')
     
     def stop(self):
-        """Close the serial connection and stop the reader thread."""
+        """Write anything still queued, then close the serial connection and stop the threads."""
+        with self._outbox_cond:
+            self._writing = False
+            self._outbox_cond.notify()
+        if self.writer_thread:
+            self.writer_thread.join(timeout=1.0)
         self.running = False
+        self._stop_event.set()
         if self.reader_thread:
             self.reader_thread.join(timeout=1.0)
         if self.serial and self.serial.is_open:
@@ -193,9 +724,12 @@ if __name__ == "__main__":
         for pattern in patterns_to_try:
             try:
                 log.info("Trying to connect using pattern: {}".format(pattern))
-                serial_conn = Serial(port_pattern=pattern, baud_rate=9600)
-                log.info("Successfully connected using pattern: {}".format(pattern))
-                break
+                serial_conn = Serial(port_pattern=pattern)
+                if serial_conn.connected:
+                    log.info("Successfully connected using pattern: {}".format(pattern))
+                    break
+                serial_conn.stop()
+                serial_conn = None
             except (ValueError, serial.SerialException) as e:
                 log.info("Could not connect using pattern '{}': {}".format(pattern, e))
                 continue
@@ -209,14 +743,14 @@ if __name__ == "__main__":
         
         # Test light control
         log.info("Testing light control...")
-        serial_conn.light_on()
+        log.info("Reply: {}".format(serial_conn.light_on(wait=True)))
         time.sleep(2)  # Wait to see the effect
         serial_conn.light_off()
         time.sleep(2)  # Wait to see the effect
         
         # Test smoke control
         log.info("Testing smoke control...")
-        serial_conn.smoke_on()
+        log.info("Reply: {}".format(serial_conn.smoke_on(wait=True)))
         time.sleep(2)  # Wait to see the effect
         serial_conn.smoke_off()
         time.sleep(2)  # Wait to see the effect
@@ -230,6 +764,8 @@ if __name__ == "__main__":
         serial_conn.smoke_off()
         time.sleep(1)  # Wait to see the effect
         
+        log.info("Round-trip latency: {}".format(serial_conn.latency_stats()))
+
         # Clean up
         log.info("Closing connection...")
         serial_conn.stop()
@@ -0,0 +1,324 @@
+"""
+Headless stand-ins for the phone's hardware, so the whole app can run off the Pi.
+
+    sim = Simulation()
+    sim.install()            # before importing app / modules.Phone
+    import app
+    phone = sim.start_app(app)
+    sim.pickup(); sim.peer.wait_for("/props/phone/pickup")
+
+- GPIO: gpiozero's MockFactory, with pins that keep absolute edge timestamps.
+- Audio out: pygame on SDL's dummy driver, or the disk driver writing raw PCM to a file.
+  The handset's channel is wrapped to timestamp every play() and stop().
+- Audio in: a PyAudio-compatible module whose one input device plays scripted WAV
+  clips in real time and silence otherwise.
+- OSC: a loopback peer standing in for the control PC.
+"""
+import audioop
+import logging
+import os
+import sys
+import threading
+import time
+import types
+import wave
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory, MockPin
+from pythonosc import dispatcher
+from pythonosc import osc_server
+from pythonosc import udp_client
+
+log = logging.getLogger("SIM")
+
+PIN_HOOKSWITCH = 8
+PIN_LEFT_RING = 23
+PIN_RIGHT_RING = 24
+PIN_DIAL = 25
+
+OSC_LISTEN_PORT = 7000 # App side; the peer sends here
+OSC_PEER_PORT = 8000   # Control PC side; the app sends here
+PULSE_SECONDS = 0.1    # Dial pulse period, 10 pps
+
+
+class RecordingPin(MockPin):
+    """MockPin that also keeps (monotonic time, state) for every change."""
+
+    def __init__(self, *args, **kwargs):
+        self.history = []
+        super().__init__(*args, **kwargs)
+
+    def _change_state(self, value):
+        changed = super()._change_state(value)
+        if changed:
+            self.history.append((time.monotonic(), value))
+        return changed
+
+    def first_edge_after(self, t, state=True):
+        for edge_time, value in list(self.history):
+            if edge_time >= t and bool(value) == state:
+                return edge_time
+        return None
+
+
+class RecordingChannel:
+    """Wraps a pygame mixer Channel and timestamps play() and stop()."""
+
+    def __init__(self, channel):
+        self._channel = channel
+        self.events = []  # (monotonic time, 'play' or 'stop')
+
+    def play(self, *args, **kwargs):
+        self.events.append((time.monotonic(), 'play'))
+        return self._channel.play(*args, **kwargs)
+
+    def stop(self):
+        self._channel.stop()
+        self.events.append((time.monotonic(), 'stop'))
+
+    def first_event_after(self, t, kind):
+        for event_time, event_kind in list(self.events):
+            if event_time >= t and event_kind == kind:
+                return event_time
+        return None
+
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
+
+
+class ScriptedInput:
+    """
+    PCM source for the simulated microphone. Queued WAV clips are delivered in real time
+    in the capture format; when nothing is queued the input is silence.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clips = []  # (label, pcm bytes) waiting to be delivered
+        self._current = b""
+        self.rate = None
+        self.channels = None
+        self.sample_width = None
+        self.clip_starts = []  # (monotonic time, label) when each clip reached the capture callback
+
+    def configure(self, rate, channels, sample_width):
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+
+    def play(self, path, label=None):
+        """Queues a WAV file, converted to the capture format."""
+        with wave.open(path, 'rb') as w:
+            pcm = w.readframes(w.getnframes())
+            width, channels, rate = w.getsampwidth(), w.getnchannels(), w.getframerate()
+        if width != self.sample_width:
+            pcm = audioop.lin2lin(pcm, width, self.sample_width)
+        if channels == 2 and self.channels == 1:
+            pcm = audioop.tomono(pcm, self.sample_width, 0.5, 0.5)
+        if rate != self.rate:
+            pcm, _ = audioop.ratecv(pcm, self.sample_width, self.channels, rate, self.rate, None)
+        with self._lock:
+            self._clips.append((label or os.path.basename(path), pcm))
+
+    def read(self, nbytes):
+        with self._lock:
+            if not self._current and self._clips:
+                label, self._current = self._clips.pop(0)
+                self.clip_starts.append((time.monotonic(), label))
+            data, self._current = self._current[:nbytes], self._current[nbytes:]
+        return data + b"\x00" * (nbytes - len(data))
+
+
+class _InputStream:
+    """PyAudio input stream that calls stream_callback from a thread at the real chunk rate."""
+
+    def __init__(self, source, rate, channels, format, frames_per_buffer, stream_callback, **kwargs):
+        self._source = source
+        self._callback = stream_callback
+        self._frames = frames_per_buffer
+        self._nbytes = frames_per_buffer * channels * _get_sample_size(format)
+        self._period = frames_per_buffer / float(rate)
+        source.configure(rate, channels, _get_sample_size(format))
+        self._running = False
+        self._thread = None
+
+    def start_stream(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="sim-audio-in")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        next_chunk = time.monotonic()
+        while self._running:
+            next_chunk += self._period
+            time.sleep(max(0.0, next_chunk - time.monotonic()))
+            self._callback(self._source.read(self._nbytes), self._frames, {}, 0)
+
+    def is_active(self):
+        return self._running
+
+    def stop_stream(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def close(self):
+        self.stop_stream()
+
+
+def _get_sample_size(fmt):
+    return {1: 4, 2: 4, 8: 2, 16: 1, 32: 1}.get(fmt, 2)
+
+
+def make_pyaudio_module(source):
+    """Returns a module exposing the parts of PyAudio that modules.AudioCapture uses."""
+    module = types.ModuleType("pyaudio")
+    module.paFloat32, module.paInt32, module.paInt16, module.paInt8, module.paUInt8 = 1, 2, 8, 16, 32
+    module.paContinue = 0
+    module.paInputOverflow = 2
+    module.get_sample_size = _get_sample_size
+
+    class PyAudio:
+        def get_device_count(self):
+            return 1
+
+        def get_device_info_by_index(self, index):
+            return {'index': 0, 'name': 'Simulated input', 'maxInputChannels': 1}
+
+        def open(self, **kwargs):
+            return _InputStream(source, **kwargs)
+
+        def terminate(self):
+            pass
+
+    module.PyAudio = PyAudio
+    return module
+
+
+class LoopbackPeer:
+    """Stands in for the control PC: records what the app sends and sends it cues."""
+
+    def __init__(self, listen_port=OSC_PEER_PORT, app_port=OSC_LISTEN_PORT):
+        self.received = []  # (monotonic time, address, args)
+        self._cond = threading.Condition()
+        d = dispatcher.Dispatcher()
+        d.set_default_handler(self._on_message)
+        self._server = osc_server.BlockingOSCUDPServer(("127.0.0.1", listen_port), d)
+        self._client = udp_client.SimpleUDPClient("127.0.0.1", app_port)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="sim-osc-peer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _on_message(self, address, *args):
+        with self._cond:
+            self.received.append((time.monotonic(), address, args))
+            self._cond.notify_all()
+
+    def send(self, address, *args):
+        """Sends a cue to the app. Returns the send time."""
+        t = time.monotonic()
+        self._client.send_message(address, list(args))
+        return t
+
+    def wait_for(self, address, after=0.0, timeout=2.0):
+        """Returns the arrival time of the first `address` message received after `after`, or None."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for t, received_address, _ in self.received:
+                    if t >= after and received_address == address:
+                        return t
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class Simulation:
+    """
+    Runs the app against simulated hardware.
+
+    Attributes:
+        audio_output (str): File that receives the raw mixer output, or None to discard it.
+        input (ScriptedInput): The simulated microphone.
+        peer (LoopbackPeer): The simulated control PC, created by start_app().
+    """
+
+    def __init__(self, audio_output=None, osc_listen_port=OSC_LISTEN_PORT, osc_peer_port=OSC_PEER_PORT):
+        self.audio_output = audio_output
+        self.osc_listen_port = osc_listen_port
+        self.osc_peer_port = osc_peer_port
+        self.input = ScriptedInput()
+        self.peer = None
+        self.app = None
+        self.channel = None
+        self.factory = None
+
+    def install(self):
+        """Points the environment at the simulated devices. Call before importing app or modules.Phone."""
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        if self.audio_output:
+            os.environ['SDL_AUDIODRIVER'] = 'disk'
+            os.environ['SDL_DISKAUDIOFILE'] = self.audio_output
+        else:
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        os.environ['SKIP_TEST'] = '1'
+        os.environ['CTRL_PC_ADDRESS'] = '127.0.0.1'
+        os.environ['DMX_TO_ARTNET_ADDRESS'] = '127.0.0.1'
+        os.environ['OSC_LISTEN_PORT'] = str(self.osc_listen_port)
+        os.environ['OSC_SEND_PORT'] = str(self.osc_peer_port)
+        if 'modules.AudioCapture' in sys.modules or 'modules.Handset' in sys.modules:
+            raise RuntimeError("Simulation.install() must run before the handset modules are imported")
+        sys.modules['pyaudio'] = make_pyaudio_module(self.input)
+        self.factory = MockFactory(pin_class=RecordingPin)
+        Device.pin_factory = self.factory
+
+    def start_app(self, app_module):
+        """Creates the app's TDIQPhone with the loopback OSC peer in place. Returns it."""
+        self.peer = LoopbackPeer(self.osc_peer_port, self.osc_listen_port)
+        self.app = app_module.TDIQPhone()
+        handset = self.app.phone.handset
+        if handset.audioChannel is not None:
+            self.channel = handset.audioChannel = RecordingChannel(handset.audioChannel)
+        return self.app
+
+    def pin(self, number):
+        return self.factory.pin(number)
+
+    def pickup(self):
+        """Lifts the handset (hookswitch closes to ground). Returns the time."""
+        t = time.monotonic()
+        self.pin(PIN_HOOKSWITCH).drive_low()
+        return t
+
+    def hangup(self):
+        """Puts the handset down. Returns the time."""
+        t = time.monotonic()
+        self.pin(PIN_HOOKSWITCH).drive_high()
+        return t
+
+    def dial(self, number, pulse=PULSE_SECONDS):
+        """Dials digits as real-time pulses on the dial pin."""
+        pin = self.pin(PIN_DIAL)
+        for ch in str(number):
+            for _ in range(int(ch) or 10):
+                pin.drive_low()
+                time.sleep(pulse * 0.4)
+                pin.drive_high()
+                time.sleep(pulse * 0.6)
+            time.sleep(pulse * 5)
+
+    def first_ring_edge_after(self, t):
+        """Time the left ringer coil first switched on at or after t, or None."""
+        return self.pin(PIN_LEFT_RING).first_edge_after(t, state=True)
+
+    def stop(self):
+        if self.app is not None:
+            self.app.stop()
+        if self.peer is not None:
+            self.peer.stop()
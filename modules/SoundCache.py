@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from pygame import mixer
+
+log = logging.getLogger("SOUNDCACHE")
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+SOUND_EXTENSIONS = (".wav", ".ogg")
+
+
+class SoundCache:
+    """
+    LRU cache of decoded pygame Sound objects, keyed by path and mtime.
+
+    Decoding a WAV from the SD card can take longer than the mixer latency,
+    so prompts are decoded once (ideally at startup via preload()) and
+    replayed from memory afterwards. Editing a file on disk changes its
+    mtime, which makes the next get() reload it.
+
+    Attributes:
+        max_bytes (int): Budget for decoded sample data. Least recently used
+                         sounds are evicted once it is exceeded.
+        hits (int): Number of get() calls served from memory.
+        misses (int): Number of get() calls that had to decode from disk.
+        evictions (int): Number of sounds dropped to stay within budget.
+        load_time (float): Total seconds spent decoding on misses.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_bytes (int): Byte budget for cached sample data. Defaults to 64 MiB.
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> (mtime, sound, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0.0
+
+    @staticmethod
+    def _sound_size(sound):
+        """Estimate the decoded size of a sound from its length and mixer format."""
+        init = mixer.get_init()
+        if not init:
+            return 0
+        frequency, size, channels = init
+        return int(sound.get_length() * frequency * channels * abs(size) // 8)
+
+    def get(self, filename):
+        """
+        Returns a decoded Sound for filename, loading it on a miss.
+
+        Raises:
+            OSError: If the file does not exist.
+            pygame.error: If the mixer cannot decode the file.
+        """
+        path = os.path.abspath(filename)
+        mtime = os.stat(path).st_mtime
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+
+        start = time.monotonic()
+        sound = mixer.Sound(path)
+        elapsed = time.monotonic() - start
+        size = self._sound_size(sound)
+
+        with self._lock:
+            self.misses += 1
+            self.load_time += elapsed
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            self._entries[path] = (mtime, sound, size)
+            self.current_bytes += size
+            self._evict()
+        log.debug("Loaded {} ({} bytes) in {:.1f}ms".format(filename, size, elapsed * 1000))
+        return sound
+
+    def _evict(self):
+        """Drops least recently used sounds until within budget. Caller holds the lock."""
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            path, (_, _, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+            log.debug("Evicted {} ({} bytes)".format(path, size))
+
+    def preload(self, directory, extensions=SOUND_EXTENSIONS):
+        """
+        Decodes every sound file in directory into the cache.
+
+        Args:
+            directory (str): Directory to scan (not recursive).
+            extensions (tuple): File extensions to load.
+
+        Returns:
+            int: Number of files loaded or already cached.
+        """
+        loaded = 0
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError as e:
+            log.error("Cannot preload sounds from {}: {}".format(directory, e))
+            return 0
+        for name in names:
+            if not name.lower().endswith(extensions):
+                continue
+            try:
+                self.get(os.path.join(directory, name))
+                loaded += 1
+            except Exception as e:
+                log.warning("Could not preload {}: {}".format(name, e))
+        log.info("Preloaded {} sounds from {} ({} bytes cached)".format(
+            loaded, directory, self.current_bytes))
+        return loaded
+
+    def clear(self):
+        """Drops all cached sounds."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Returns a snapshot of cache counters as a dict."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'load_time': self.load_time,
+            }
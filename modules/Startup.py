@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger("STARTUP")
+
+
+class _Phase:
+    def __init__(self, name, fn, after, critical):
+        self.name = name
+        self.fn = fn
+        self.after = after
+        self.critical = critical
+        self.done = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+
+class Startup:
+    """
+    Brings subsystems up concurrently, each phase on its own thread as soon as the
+    phases it depends on have finished, and records when each one started and ended.
+
+    Attributes:
+        t0 (float): Monotonic time the timeline is measured from (e.g. when app.py was imported).
+    """
+
+    def __init__(self, t0=None):
+        """
+        Args:
+            t0 (float): Monotonic start of the timeline. Defaults to now.
+        """
+        self.t0 = time.monotonic() if t0 is None else t0
+        self._phases = {}
+        self._order = []
+        self._milestones = []
+        self._lock = threading.Lock()
+
+    def phase(self, name, fn, after=(), critical=True):
+        """
+        Starts fn() on its own thread once every phase in `after` has finished.
+
+        Args:
+            name (str): Phase name, used by after= and wait().
+            fn (callable): Work to do; its return value is kept as the phase result.
+            after (tuple): Names of phases that must finish first.
+            critical (bool): Whether run() waits for this phase. Non-critical phases
+                             (warm-up, self-test) keep running in the background.
+        """
+        phase = _Phase(name, fn, tuple(after), critical)
+        with self._lock:
+            self._phases[name] = phase
+            self._order.append(name)
+        thread = threading.Thread(target=self._run_phase, args=(phase,), name="startup-" + name)
+        thread.daemon = True
+        thread.start()
+
+    def _run_phase(self, phase):
+        for dependency in phase.after:
+            self.wait(dependency)
+            if self._phases[dependency].error is not None:
+                phase.error = RuntimeError("{} failed".format(dependency))
+                phase.done.set()
+                return
+        phase.started_at = time.monotonic()
+        try:
+            phase.result = phase.fn()
+        except Exception as e:
+            phase.error = e
+            log.error("Startup phase '{}' failed: {}".format(phase.name, e), exc_info=True)
+        phase.finished_at = time.monotonic()
+        phase.done.set()
+
+    def wait(self, name, timeout=None):
+        """Blocks until the named phase has finished. Returns its result.
+
+        Raises:
+            RuntimeError: If the phase failed or didn't finish within timeout.
+        """
+        phase = self._phases[name]
+        if not phase.done.wait(timeout):
+            raise RuntimeError("Startup phase '{}' not ready".format(name))
+        if phase.error is not None:
+            raise RuntimeError("Startup phase '{}' failed: {}".format(name, phase.error))
+        return phase.result
+
+    def phases(self):
+        """Names of the phases registered so far, in order."""
+        return list(self._order)
+
+    def is_done(self, name):
+        phase = self._phases.get(name)
+        return phase is not None and phase.done.is_set() and phase.error is None
+
+    def run(self, timeout=None):
+        """Waits for every critical phase. Raises RuntimeError if one failed."""
+        for name in list(self._order):
+            if self._phases[name].critical:
+                self.wait(name, timeout)
+
+    def mark(self, milestone):
+        """Records a named point in time, e.g. when the prop can first take a cue."""
+        self._milestones.append((milestone, time.monotonic()))
+
+    def report(self):
+        """Returns the timeline as lines of text: per-phase start and duration, then milestones."""
+        lines = ["{:<14} {:>9} {:>9}".format("phase", "start ms", "took ms")]
+        for name in self._order:
+            phase = self._phases[name]
+            if phase.started_at is None:
+                lines.append("{:<14} {:>9} {:>9}".format(name, "-", "failed" if phase.error else "waiting"))
+                continue
+            took = "running" if phase.finished_at is None else "{:.0f}".format((phase.finished_at - phase.started_at) * 1000)
+            if phase.error is not None:
+                took += " (failed)"
+            lines.append("{:<14} {:>9.0f} {:>9}".format(name, (phase.started_at - self.t0) * 1000, took))
+        for milestone, t in self._milestones:
+            lines.append("{} at {:.0f} ms".format(milestone, (t - self.t0) * 1000))
+        return lines
@@ -0,0 +1,240 @@
+"""
+Lightweight tracing of the hot paths, for answering "the phone lagged" after the fact.
+
+    from modules import Trace
+
+    with Trace.span("osc.send", "osc", address=address):
+        ...
+
+    @Trace.traced("handset.play_file", "audio")
+    def play_file(self, filename): ...
+
+Spans go into a fixed-size ring buffer allocated up front, so tracing can stay on for
+a whole show; the oldest spans are overwritten. dump() writes the buffer as Chrome
+trace JSON (open it in chrome://tracing or https://ui.perfetto.dev). Spans recorded
+after begin_interaction() (called on pick-up) carry that interaction's id and are
+linked by flow arrows, so one visitor's pickup, cues, audio and lights read as one
+causal timeline across threads.
+
+Tracing is off unless TRACE is set in the environment or enable() is called. While
+off, span() returns a shared no-op object and traced() functions make one attribute
+check before calling straight through.
+"""
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+log = logging.getLogger("TRACE")
+
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", 8192)) # Spans kept; older ones are overwritten
+TRACE_DIR = os.path.join("tmp", "traces")
+
+
+def trace_path(name):
+    """
+    Returns TRACE_DIR/name for a bare file name from outside (e.g. an OSC request).
+
+    Raises:
+        ValueError: If name is empty or contains a path separator or "..".
+    """
+    if not isinstance(name, str) or not name or name in (".", "..") or ".." in name \
+            or "/" in name or "\\" in name or (os.altsep and os.altsep in name):
+        raise ValueError("Trace file must be a plain file name, got {!r}".format(name))
+    return os.path.join(TRACE_DIR, name)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('_tracer', '_name', '_cat', '_args', '_start')
+
+    def __init__(self, tracer, name, cat, args):
+        self._tracer = tracer
+        self._name = name
+        self._cat = cat
+        self._args = args
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.monotonic()
+        if exc_type is not None:
+            self._args['error'] = exc_type.__name__
+        self._tracer.record(self._name, self._cat, self._start, end - self._start, self._args)
+        return False
+
+
+class Tracer:
+    """
+    Records spans into a preallocated ring buffer.
+
+    Each slot holds one (name, category, start, duration, thread id, args, interaction)
+    tuple. A slot is claimed with itertools.count, whose next() is atomic under the GIL,
+    so recording takes no lock.
+
+    Attributes:
+        enabled (bool): Whether spans are recorded.
+        size (int): Ring buffer slots.
+    """
+
+    def __init__(self, size=TRACE_BUFFER_SIZE, enabled=False):
+        """
+        Args:
+            size (int): Ring buffer slots. Defaults to TRACE_BUFFER_SIZE.
+            enabled (bool): Start recording immediately. Defaults to False.
+        """
+        self.size = size
+        self.enabled = enabled
+        self.t0 = time.monotonic()
+        self._slots = [None] * size
+        self._counter = itertools.count()
+        self._interaction_ids = itertools.count(1)
+        self._interaction = 0
+        self._thread_names = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        """Empties the buffer. Only call while nothing is recording."""
+        self._slots = [None] * self.size
+        self._counter = itertools.count()
+
+    def begin_interaction(self):
+        """Starts a new interaction (e.g. a pick-up). Spans recorded from now on carry its id. Returns the id."""
+        self._interaction = next(self._interaction_ids)
+        return self._interaction
+
+    def end_interaction(self):
+        """Ends the current interaction (e.g. on hang-up). Later spans carry no interaction id."""
+        self._interaction = 0
+
+    def span(self, name, cat="", **args):
+        """Context manager timing the enclosed block. A no-op while disabled."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def traced(self, name=None, cat=""):
+        """Decorator recording a span for every call of the function."""
+        def decorate(fn):
+            span_name = name or fn.__qualname__
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.monotonic()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(span_name, cat, start, time.monotonic() - start, None)
+            return wrapper
+        return decorate
+
+    def instant(self, name, cat="", **args):
+        """Records a zero-length event, e.g. a GPIO edge."""
+        if self.enabled:
+            self.record(name, cat, time.monotonic(), 0.0, args)
+
+    def record(self, name, cat, start, duration, args=None):
+        """
+        Stores a span measured by the caller (monotonic start, duration in seconds).
+        Useful where the code already times itself.
+        """
+        if not self.enabled:
+            return
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        slot = next(self._counter) % self.size
+        self._slots[slot] = (name, cat, start, duration, tid, args, self._interaction)
+
+    def snapshot(self):
+        """Returns the recorded spans, oldest first."""
+        spans = [s for s in list(self._slots) if s is not None]
+        spans.sort(key=lambda s: s[2])
+        return spans
+
+    def to_chrome_trace(self):
+        """Returns the buffer as a Chrome trace dict ("X" events, thread names and interaction flows)."""
+        pid = os.getpid()
+        events = []
+        flows = {}
+        for name, cat, start, duration, tid, args, interaction in self.snapshot():
+            ts = (start - self.t0) * 1e6
+            event = {'name': name, 'cat': cat or "app", 'ph': 'X', 'ts': ts, 'dur': duration * 1e6,
+                     'pid': pid, 'tid': tid}
+            if args or interaction:
+                event['args'] = dict(args or {})
+                if interaction:
+                    event['args']['interaction'] = interaction
+            events.append(event)
+            if interaction:
+                flows.setdefault(interaction, []).append((ts, tid))
+        for interaction, points in flows.items():
+            for i, (ts, tid) in enumerate(points):
+                phase = 's' if i == 0 else ('f' if i == len(points) - 1 else 't')
+                events.append({'name': "interaction", 'cat': "interaction", 'ph': phase, 'bp': 'e',
+                               'id': interaction, 'ts': ts, 'pid': pid, 'tid': tid})
+        for tid, thread_name in list(self._thread_names.items()):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': thread_name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path=None):
+        """
+        Writes the buffer as Chrome trace JSON.
+
+        Args:
+            path (str): Output file. Defaults to a timestamped file in TRACE_DIR.
+
+        Returns:
+            str: The path written.
+        """
+        if path is None:
+            path = os.path.join(TRACE_DIR, "trace-{}.json".format(time.strftime("%Y%m%d-%H%M%S")))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        trace = self.to_chrome_trace()
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+        log.info("Wrote {} trace events to {}".format(len(trace['traceEvents']), path))
+        return path
+
+    def stats(self):
+        recorded = sum(1 for s in list(self._slots) if s is not None)
+        return {
+            'enabled': self.enabled,
+            'size': self.size,
+            'recorded': recorded,
+            'threads': len(self._thread_names),
+            'interaction': self._interaction,
+        }
+
+
+tracer = Tracer(enabled=bool(os.environ.get("TRACE")))
+
+span = tracer.span
+traced = tracer.traced
+instant = tracer.instant
+record = tracer.record
+begin_interaction = tracer.begin_interaction
+end_interaction = tracer.end_interaction
+dump = tracer.dump
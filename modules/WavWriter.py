@@ -0,0 +1,132 @@
+import logging
+import os
+import struct
+
+log = logging.getLogger("WAVWRITER")
+
+HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI") # RIFF header, PCM fmt chunk, data chunk header
+HEADER_UPDATE_SECONDS = 2.0 # Audio written between header rewrites; a crash loses at most this from the header's view
+WRITE_BUFFER_BYTES = 64 * 1024
+MAX_DATA_BYTES = 0xFFFFFFFF - HEADER.size # RIFF sizes are 32-bit
+
+
+def segment_path(path, index):
+    """recording.wav, 3 -> recording-003.wav"""
+    base, ext = os.path.splitext(path)
+    return "{}-{:03d}{}".format(base, index, ext or ".wav")
+
+
+class WavWriter:
+    """
+    Writes PCM to a WAV file as it arrives, so memory use doesn't grow with the
+    recording and a crash or power cut leaves a playable file.
+
+    The header is written up front with the sizes seen so far and rewritten every
+    HEADER_UPDATE_SECONDS of audio and on close(). With segment_seconds set, the
+    recording is split into numbered files (recording-000.wav, recording-001.wav, ...)
+    at exact frame boundaries; a segment is also started before a file would pass
+    the 4 GiB WAV limit.
+
+    Attributes:
+        path (str): Output file, or the base name for segments.
+        paths (list): Files written so far.
+        frames_written (int): Frames across all segments.
+    """
+
+    def __init__(self, path, rate, channels, sample_width, segment_seconds=None,
+                 header_update_seconds=HEADER_UPDATE_SECONDS):
+        """
+        Args:
+            path (str): Output file.
+            rate (int): Sample rate in Hz.
+            channels (int): Channels.
+            sample_width (int): Bytes per sample.
+            segment_seconds (float): Start a new file every this many seconds. Defaults to one file.
+            header_update_seconds (float): Audio between header rewrites. Defaults to HEADER_UPDATE_SECONDS.
+        """
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frame_bytes = channels * sample_width
+        self.segment_seconds = segment_seconds
+        max_frames = MAX_DATA_BYTES // self.frame_bytes
+        if segment_seconds:
+            max_frames = min(max_frames, max(1, int(segment_seconds * rate)))
+        self._segment_bytes = max_frames * self.frame_bytes
+        self._header_interval = max(self.frame_bytes, int(header_update_seconds * rate) * self.frame_bytes)
+        self._file = None
+        self._data_bytes = 0
+        self._since_header = 0
+        self.paths = []
+        self.frames_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _open_segment(self):
+        if self.segment_seconds or self.paths:
+            path = segment_path(self.path, len(self.paths))
+        else:
+            path = self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, 'wb', buffering=WRITE_BUFFER_BYTES)
+        self._data_bytes = 0
+        self._since_header = 0
+        self._file.write(self._header(0))
+        self.paths.append(path)
+        if len(self.paths) > 1:
+            log.debug("Started recording segment {}".format(path))
+
+    def _header(self, data_bytes):
+        return HEADER.pack(b"RIFF", 36 + data_bytes + (data_bytes & 1), b"WAVE",
+                           b"fmt ", 16, 1, self.channels, self.rate, self.rate * self.frame_bytes,
+                           self.frame_bytes, self.sample_width * 8,
+                           b"data", data_bytes)
+
+    def _update_header(self):
+        """Rewrites the sizes for what has been written so far, then returns to the end."""
+        self._file.flush()
+        self._file.seek(0)
+        self._file.write(self._header(self._data_bytes))
+        self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+        self._since_header = 0
+
+    def _close_segment(self):
+        if self._data_bytes & 1:
+            self._file.write(b"\x00") # Chunks are word aligned
+        self._update_header()
+        self._file.close()
+        self._file = None
+
+    def write(self, data):
+        """Appends PCM (bytes, bytearray or memoryview) of whole frames."""
+        view = memoryview(data).cast('B')
+        while len(view):
+            if self._file is None:
+                self._open_segment()
+            room = self._segment_bytes - self._data_bytes
+            part = view[:room]
+            self._file.write(part)
+            self._data_bytes += len(part)
+            self._since_header += len(part)
+            self.frames_written += len(part) // self.frame_bytes
+            view = view[len(part):]
+            if self._data_bytes >= self._segment_bytes:
+                self._close_segment()
+            elif self._since_header >= self._header_interval:
+                self._update_header()
+
+    def close(self):
+        """Finalises the header of the current file. Safe to call more than once."""
+        if self._file is not None:
+            self._close_segment()
+
+    @property
+    def seconds_written(self):
+        return self.frames_written / float(self.rate)
@@ -0,0 +1,92 @@
+import os
+import socket
+import sys
+import time
+import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules.ArtNet import ArtNetClient
+
+# --- Configuration ---
+# Packets go to a local UDP socket so the benchmark measures the client, not the network.
+TARGET_IP = "127.0.0.1"
+DURATION = 2.0 # Seconds per case
+
+
+def legacy_make_packet(client, buffer):
+    """Packet construction as done before the preallocated buffer: new bytearray + copy per send."""
+    packet = bytearray(client.HEADER)
+    packet.extend([
+        client.OPCODE_ARTDMX & 0xFF, (client.OPCODE_ARTDMX >> 8) & 0xFF,
+        0x00, client.PROTOCOL_VERSION, 0x00, 0x00,
+        client.universe & 0xFF, 0x00,
+        (client.packet_size >> 8) & 0xFF, client.packet_size & 0xFF,
+    ])
+    packet.extend(buffer)
+    return packet
+
+
+def run(name, step):
+    """Calls step() repeatedly for DURATION seconds and prints packets per second."""
+    count = 0
+    start = time.monotonic()
+    end = start + DURATION
+    while time.monotonic() < end:
+        for _ in range(100):
+            step(count)
+            count += 1
+    elapsed = time.monotonic() - start
+    print("  {:<32} {:>10.0f} packets/s".format(name, count / elapsed))
+    return count / elapsed
+
+
+def main():
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind((TARGET_IP, 0))
+    sink.setblocking(False)
+    port = sink.getsockname()[1]
+
+    client = ArtNetClient(target_ip=TARGET_IP, universe=0)
+    client._address = (TARGET_IP, port)
+    legacy_buffer = array.array('B', [0] * client.packet_size)
+    frame = bytes(range(256)) * 2
+
+    def drain():
+        try:
+            while True: sink.recv(1024)
+        except (BlockingIOError, socket.error):
+            pass
+
+    def legacy_send_value(i):
+        legacy_buffer[449] = i & 0xFF
+        client._socket.sendto(legacy_make_packet(client, legacy_buffer), client._address)
+        if i % 64 == 0: drain()
+
+    def legacy_full_frame(i):
+        for c in range(client.packet_size):
+            legacy_buffer[c] = frame[c]
+        client._socket.sendto(legacy_make_packet(client, legacy_buffer), client._address)
+        if i % 64 == 0: drain()
+
+    def send_value(i):
+        client.send_value(450, i & 0xFF)
+        if i % 64 == 0: drain()
+
+    def set_channels(i):
+        client.set_channels(1, frame)
+        if i % 64 == 0: drain()
+
+    print("--- Art-Net packet rate ({}s per case) ---".format(DURATION))
+    before = run("before: send_value", legacy_send_value)
+    after = run("after: send_value", send_value)
+    print("  speedup: {:.2f}x".format(after / before))
+    before = run("before: 512-channel frame", legacy_full_frame)
+    after = run("after: set_channels(1, frame)", set_channels)
+    print("  speedup: {:.2f}x".format(after / before))
+
+    client.stop()
+    sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules.Simulation import Simulation
+
+# --- Configuration ---
+ITERATIONS = 50
+PLAYBACK_FILE = "assets/dialogue/4-always-listening.wav"
+AUDIO_OUTPUT = None # e.g. "/tmp/phone-output.raw" to keep what the mixer played
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def report(name, samples, expected):
+    if not samples:
+        print("  {:<34} no samples (0/{})".format(name, expected))
+        return
+    print("  {:<34} p50 {:>7.2f}ms  p99 {:>7.2f}ms  ({}/{})".format(
+        name, percentile(samples, 0.5) * 1000, percentile(samples, 0.99) * 1000, len(samples), expected))
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result is not None:
+            return result
+        time.sleep(0.001)
+    return None
+
+
+def bench_pickup(sim):
+    samples = []
+    for _ in range(ITERATIONS):
+        sim.hangup()
+        time.sleep(0.02)
+        start = sim.pickup()
+        arrived = sim.peer.wait_for("/props/phone/pickup", after=start)
+        if arrived is not None:
+            samples.append(arrived - start)
+    return samples
+
+
+def bench_ring(sim, phone):
+    samples = []
+    for _ in range(ITERATIONS):
+        start = sim.peer.send("/props/phone/start", 1)
+        edge = wait_until(lambda: sim.first_ring_edge_after(start))
+        if edge is not None:
+            samples.append(edge - start)
+        phone.ringer.cancel()
+        wait_until(lambda: None if phone.ringer.is_ringing else True)
+    return samples
+
+
+def bench_hangup(sim, handset):
+    samples = []
+    for _ in range(ITERATIONS):
+        sim.pickup()
+        handset.loop_file(PLAYBACK_FILE)
+        time.sleep(0.02)
+        start = sim.hangup()
+        stopped = wait_until(lambda: sim.channel.first_event_after(start, 'stop'))
+        if stopped is not None and not handset.audioChannel.get_busy():
+            samples.append(stopped - start)
+    return samples
+
+
+if __name__ == "__main__":
+    sim = Simulation(audio_output=AUDIO_OUTPUT)
+    sim.install()
+    import app
+    tdiq = sim.start_app(app)
+    time.sleep(0.5)
+    try:
+        print("--- End-to-end latency on simulated hardware ({} iterations) ---".format(ITERATIONS))
+        report("pickup -> /props/phone/pickup", bench_pickup(sim), ITERATIONS)
+        report("/props/phone/start -> ring edge", bench_ring(sim, tdiq.phone), ITERATIONS)
+        report("hang-up -> audio stopped", bench_hangup(sim, tdiq.phone.handset), ITERATIONS)
+    finally:
+        sim.stop()
@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules.LedEffects import Fire2012
+from modules.LedStream import check_bandwidth, FPS
+
+# --- Configuration ---
+# Baud rates to check; the sketch and modules/Serial.py default to 500000.
+BAUD_RATES = [9600, 115200, 250000, 500000, 1000000]
+FRAMES = 900 # 30 seconds of fire at 30 fps
+
+
+if __name__ == "__main__":
+    print("--- Fire2012 over serial: {} frames at {} fps ---".format(FRAMES, FPS))
+    for baud_rate in BAUD_RATES:
+        result = check_bandwidth(Fire2012(seed=1), baud_rate, FPS, FRAMES)
+        print("  {:>8} baud  budget {:>6.0f} B/frame  mean {:>5.0f}  p99 {:>4}  max {:>4}  {}".format(
+            baud_rate, result['budget_bytes'], result['mean_bytes'], result['p99_bytes'], result['max_bytes'],
+            "ok" if result['ok'] else "too slow for {} fps".format(FPS)))
+
+    effect = Fire2012(seed=1)
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        effect.render()
+    print("  render: {:.3f} ms/frame".format((time.perf_counter() - start) / FRAMES * 1000))
@@ -0,0 +1,64 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pythonosc import udp_client
+from modules.OSC import OSCHandler, BACKENDS
+
+# --- Configuration ---
+# Both ends run on localhost so the numbers reflect dispatch cost, not the network.
+LISTEN_IP = "127.0.0.1"
+LISTEN_PORT = 7100
+MESSAGE_COUNT = 5000
+BURST = 50 # Messages sent back-to-back before a short pause, like a cue burst from the control PC
+BURST_PAUSE = 0.002
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def bench(backend, port):
+    """Sends MESSAGE_COUNT numbered messages and times each one from send to handler entry."""
+    sent_at = [0.0] * MESSAGE_COUNT
+    latencies = []
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def on_message(address, seq):
+        now = time.perf_counter()
+        with lock:
+            latencies.append(now - sent_at[seq])
+            if len(latencies) == MESSAGE_COUNT:
+                done.set()
+
+    handler = OSCHandler(listen_ip=LISTEN_IP, listen_port=port, backend=backend)
+    handler.subscribe("/bench", on_message)
+    handler.start_server()
+    time.sleep(0.2)
+
+    client = udp_client.SimpleUDPClient(LISTEN_IP, port)
+    start = time.perf_counter()
+    for seq in range(MESSAGE_COUNT):
+        sent_at[seq] = time.perf_counter()
+        client.send_message("/bench", seq)
+        if seq % BURST == BURST - 1:
+            time.sleep(BURST_PAUSE)
+    done.wait(timeout=10)
+    elapsed = time.perf_counter() - start
+    handler.stop_server()
+
+    received = len(latencies)
+    print("  {:<10} {:>6}/{} received  {:>8.0f} msg/s  p50 {:>6.2f}ms  p99 {:>6.2f}ms".format(
+        backend, received, MESSAGE_COUNT, received / elapsed,
+        percentile(latencies, 0.5) * 1000 if latencies else 0,
+        percentile(latencies, 0.99) * 1000 if latencies else 0))
+
+
+if __name__ == "__main__":
+    print("--- OSC server backends: {} messages in bursts of {} ---".format(MESSAGE_COUNT, BURST))
+    for i, backend in enumerate(BACKENDS):
+        bench(backend, LISTEN_PORT + i)
@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pythonosc import dispatcher
+from pythonosc import osc_server
+from pythonosc import udp_client
+from pythonosc.osc_message_builder import OscMessageBuilder
+from modules.OSCDispatch import FastDispatcher
+
+# --- Configuration ---
+# Sender and receiver both run on this machine, as with test/msg-sender.py pointed at "127.0.0.1".
+TARGET_IP = "127.0.0.1"
+TARGET_PORT = 7200
+MESSAGE_COUNT = 20000
+EXTRA_ADDRESSES = 50 # Other subscriptions a show might add; python-osc tries every one per message
+
+# The messages the control PC sends (see test/msg-sender.py), plus one wildcard subscription.
+menu_items = {
+    "1": ("/props/phone/start", 1),
+    "2": ("/props/phone/stop", 1),
+    "3": ("/props/phone/volume", 0.75),
+}
+WILDCARD_SUBSCRIPTION = "/props/lights/*"
+WILDCARD_MESSAGE = ("/props/lights/smoke", 1)
+
+
+def make_dispatcher(fast, counter):
+    d = FastDispatcher() if fast else dispatcher.Dispatcher()
+    def handler(address, *args):
+        counter[0] += 1
+    for address, _ in menu_items.values():
+        d.map(address, handler)
+    for i in range(EXTRA_ADDRESSES):
+        d.map("/props/extra/{}".format(i), handler)
+    d.map(WILDCARD_SUBSCRIPTION, handler)
+    return d
+
+
+def build(address, value):
+    builder = OscMessageBuilder(address=address)
+    builder.add_arg(value)
+    return builder.build().dgram
+
+
+def bench_dispatch(fast):
+    """Calls call_handlers_for_packet directly: parsing plus address matching, no sockets."""
+    counter = [0]
+    d = make_dispatcher(fast, counter)
+    packets = [build(*item) for item in menu_items.values()] + [build(*WILDCARD_MESSAGE)]
+    start = time.perf_counter()
+    for i in range(MESSAGE_COUNT):
+        d.call_handlers_for_packet(packets[i % len(packets)], (TARGET_IP, 0))
+    elapsed = time.perf_counter() - start
+    assert counter[0] == MESSAGE_COUNT, counter[0]
+    return MESSAGE_COUNT / elapsed
+
+
+def bench_udp(fast, port):
+    """Sends MESSAGE_COUNT messages over localhost UDP to a blocking server and times until all are handled."""
+    counter = [0]
+    done = threading.Event()
+    d = make_dispatcher(fast, counter)
+    def last(address, *args):
+        done.set()
+    d.map("/bench/done", last)
+    server = osc_server.BlockingOSCUDPServer((TARGET_IP, port), d)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    client = udp_client.SimpleUDPClient(TARGET_IP, port)
+    items = list(menu_items.values()) + [WILDCARD_MESSAGE]
+    start = time.perf_counter()
+    for i in range(MESSAGE_COUNT):
+        address, value = items[i % len(items)]
+        client.send_message(address, value)
+        if i % 20 == 19:
+            time.sleep(0) # Let the server thread run, as a real sender would not saturate the GIL
+    client.send_message("/bench/done", 1)
+    done.wait(timeout=10)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    return counter[0], counter[0] / elapsed
+
+
+if __name__ == "__main__":
+    print("--- OSC dispatch: {} messages, {} subscriptions ---".format(
+        MESSAGE_COUNT, len(menu_items) + EXTRA_ADDRESSES + 1))
+    before = bench_dispatch(False)
+    after = bench_dispatch(True)
+    print("  dispatch only   python-osc {:>9.0f} msg/s   fast {:>9.0f} msg/s   speedup {:.1f}x".format(
+        before, after, after / before))
+    received_before, before = bench_udp(False, TARGET_PORT)
+    received_after, after = bench_udp(True, TARGET_PORT + 1)
+    print("  UDP localhost   python-osc {:>9.0f} msg/s   fast {:>9.0f} msg/s   ({} / {} received)".format(
+        before, after, received_before, received_after))